@@ -1,76 +1,264 @@
-from flask import Flask, request, jsonify
+import time
+STARTED_AT = time.perf_counter()
+
+from flask import Flask, Response, g, request, jsonify, send_file
 from flask_cors import CORS
-import requests
-from bs4 import BeautifulSoup
+import io
 import json
 import os
+import re
 import uuid
 import datetime
 import glob
 import threading
-import time
+import concurrent.futures
+import signal
+import argparse
 from pathlib import Path
+from urllib.parse import urlsplit
 
-# Import the VideoClipper from the parent directory
+from mpc_client import MpcError, MpcUnavailableError
+from player_state import PlayerRegistry, format_position
+from clip_index import ClipIntervalIndex, parse_time
+from source_registry import SourceRegistry
+from thumbnails import ThumbnailCache, ThumbnailError, ThumbnailService
+from search_index import SearchIndex
+from clip_import import FORMATS as IMPORT_FORMATS, ClipImportError, detect_format, read_clips
+from metrics import JOB_BUCKETS, SIZE_BUCKETS, registry as metrics_registry
+
+# The VideoClipper lives in the parent directory
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
-try:
-    from api import VideoClipper
-except ImportError:
-    # Fallback for development
-    class VideoClipper:
-        @staticmethod
-        def go(json_file, output_dir, callback=None):
-            # Mock implementation for development
-            print(f"Mock clipping: {json_file} -> {output_dir}")
-            if callback:
-                callback(["mock_clip1.mp4", "mock_clip2.mp4"])
-            return ["mock_clip1.mp4", "mock_clip2.mp4"]
+
+class MockVideoClipper:
+    """Fallback for development"""
+    @staticmethod
+    def go(json_file, output_dir, callback=None):
+        # Mock implementation for development
+        print(f"Mock clipping: {json_file} -> {output_dir}")
+        if callback:
+            callback(["mock_clip1.mp4", "mock_clip2.mp4"])
+        return ["mock_clip1.mp4", "mock_clip2.mp4"]
+
+def get_video_clipper():
+    """Import the VideoClipper on first use, it pulls in heavy video libraries"""
+    try:
+        from api import VideoClipper
+    except ImportError:
+        VideoClipper = MockVideoClipper
+    return VideoClipper
 
 app = Flask(__name__)
 CORS(app)
 
 # Configuration
-MPC_HC_INFO_URL = "http://127.0.0.1:13579/info.html"
-MPC_HC_VARIABLES_URL = "http://127.0.0.1:13579/variables.html"
+MPC_HC_BASE_URL = "http://127.0.0.1:13579"
+MPC_HC_DEADLINE = 1.5  # seconds a request thread may wait for MPC-HC
+MPC_HC_FRESHNESS = 0.1  # seconds a fetched player state is reused
+DEFAULT_PLAYER_ID = "default"
 AUTO_SAVE_DIR = "./auto-save"
+SOURCE_CACHE_FILE = "./cache/sources.json"
+PLAYER_REGISTRY_FILE = "./cache/players.json"
+THUMBNAIL_CACHE_DIR = "./cache/thumbnails"
+THUMBNAIL_CACHE_BYTES = 256 * 1024 * 1024
+THUMBNAIL_WAIT = 10.0  # seconds a thumbnail request waits for extraction
+SEARCH_INDEX_FILE = "./cache/search.db"
 
 # Global variables
 session_data = {}
+player_registry = None
+player_registry_lock = threading.Lock()
+source_registry = None
+source_registry_lock = threading.Lock()
+thumbnail_service = None
+thumbnail_service_lock = threading.Lock()
+search_index = None
+search_index_lock = threading.Lock()
+
+# Startup housekeeping state (runs in background after the first request)
+housekeeping_state = {'status': 'pending', 'started': False}
+housekeeping_lock = threading.Lock()
+
+# Running video clipping threads, drained on shutdown
+clipping_jobs = []
+clipping_jobs_lock = threading.Lock()
+
+# Cached auto-save summaries keyed by file path: (mtime, summary)
+auto_save_cache = {}
+auto_save_cache_lock = threading.Lock()
+
+# Metrics, served by /api/metrics
+HTTP_REQUESTS = metrics_registry.counter(
+    'http_requests_total', 'HTTP requests by route and status', ('method', 'route', 'status'))
+HTTP_REQUEST_SECONDS = metrics_registry.histogram(
+    'http_request_seconds', 'HTTP request handling time by route', ('method', 'route'))
+AUTO_SAVE_SECONDS = metrics_registry.histogram(
+    'auto_save_write_seconds', 'Time to serialize and write an auto-save')
+AUTO_SAVE_BYTES = metrics_registry.histogram(
+    'auto_save_bytes', 'Size of written auto-saves', buckets=SIZE_BUCKETS)
+AUTO_SAVE_FAILURES = metrics_registry.counter(
+    'auto_save_failures_total', 'Auto-saves that could not be written')
+CLIPPING_JOBS = metrics_registry.counter(
+    'clipping_jobs_total', 'Clipping jobs by outcome (started, completed, failed)', ('outcome',))
+CLIPPING_JOB_SECONDS = metrics_registry.histogram(
+    'clipping_job_seconds', 'Duration of clipping jobs', buckets=JOB_BUCKETS)
+metrics_registry.gauge(
+    'sessions', 'Sessions in memory', function=lambda: len(session_data))
+metrics_registry.gauge(
+    'clips', 'Clips across sessions in memory',
+    function=lambda: sum(len(session.clips) for session in list(session_data.values())))
+metrics_registry.gauge(
+    'clipping_jobs_running', 'Clipping jobs currently running',
+    function=lambda: sum(1 for job in list(clipping_jobs) if job.is_alive()))
+metrics_registry.gauge(
+    'uptime_seconds', 'Seconds since the backend started',
+    function=lambda: round(time.perf_counter() - STARTED_AT, 3))
+
+def new_clip_id():
+    return uuid.uuid4().hex[:12]
+
+def intern_clip_source(clip):
+    """Point the clip at its registered source: one shared path string plus a source id"""
+    if clip.get('path'):
+        source = get_source_registry().register(clip['path'])
+        clip['source_id'] = source['id']
+        clip['path'] = source['path']
+    elif clip.get('source_id'):
+        clip['path'] = get_source_registry().path_of(clip['source_id'])
+    else:
+        clip.pop('source_id', None)
+    return clip
 
 class ClipSession:
     def __init__(self):
         self.session_id = str(uuid.uuid4())
         self.clips = []
+        # clip id -> list index; entries go stale after inserts and removals before them,
+        # and are checked against the list and rebuilt in one pass when they do
+        self.positions = {}
+        self.index = ClipIntervalIndex()
         self.created_at = datetime.datetime.now()
         self.last_modified = datetime.datetime.now()
+        self.player_id = DEFAULT_PLAYER_ID
         
-    def add_clip(self, clip_data):
-        self.clips.append(clip_data)
+    def add_clip(self, clip_data, position=None):
+        clip_data.setdefault('id', new_clip_id())
+        intern_clip_source(clip_data)
+        if position is None:
+            self.clips.append(clip_data)
+            position = len(self.clips) - 1
+        else:
+            self.clips.insert(position, clip_data)
+        self.positions[clip_data['id']] = position
+        self.index.add(clip_data)
         self.last_modified = datetime.datetime.now()
         
+    def add_clips(self, clips):
+        """Append many clips at once, indexing them in one batch"""
+        for clip in clips:
+            clip.setdefault('id', new_clip_id())
+            intern_clip_source(clip)
+        for position, clip in enumerate(clips, len(self.clips)):
+            self.positions[clip['id']] = position
+        self.clips.extend(clips)
+        self.index.add_many(clips)
+        self.last_modified = datetime.datetime.now()
+
     def remove_clip(self, index):
         if 0 <= index < len(self.clips):
-            self.clips.pop(index)
+            clip = self.clips.pop(index)
+            self.positions.pop(clip.get('id'), None)
+            self.index.remove(clip.get('id'))
             self.last_modified = datetime.datetime.now()
             return True
         return False
         
     def update_clip(self, index, clip_data):
         if 0 <= index < len(self.clips):
+            # Clip ids are stable across edits
+            clip_data['id'] = self.clips[index].get('id') or new_clip_id()
+            intern_clip_source(clip_data)
             self.clips[index] = clip_data
+            self.positions[clip_data['id']] = index
+            self.index.update(clip_data)
             self.last_modified = datetime.datetime.now()
             return True
         return False
+
+    def set_clips(self, clips):
+        """Replace all clips (e.g. from an auto-save) and rebuild the index"""
+        for clip in clips:
+            clip.setdefault('id', new_clip_id())
+            intern_clip_source(clip)
+        self.clips = clips
+        self.positions = {}
+        self.index.rebuild(clips)
+
+    def clip_position(self, clip_id):
+        position = self.positions.get(clip_id)
+        if position is None or position >= len(self.clips) or self.clips[position].get('id') != clip_id:
+            self.positions = {clip.get('id'): position for position, clip in enumerate(self.clips)}
+            position = self.positions.get(clip_id)
+        return position
+
+    def clips_by_ids(self, clip_ids):
+        """Clips with their list index, in clip list order"""
+        found = []
+        for clip_id in set(clip_ids):
+            position = self.clip_position(clip_id)
+            if position is not None:
+                found.append(dict(self.clips[position], index=position))
+        found.sort(key=lambda clip: clip['index'])
+        return found
         
     def to_dict(self):
         return {
             'session_id': self.session_id,
             'clips': self.clips,
             'created_at': self.created_at.isoformat(),
-            'last_modified': self.last_modified.isoformat()
+            'last_modified': self.last_modified.isoformat(),
+            'player_id': self.player_id
         }
 
+    def to_storage_dict(self):
+        """Compact form for auto-saves: each source path is written once, clips refer to it by id"""
+        sources = {}
+        clips = []
+        for clip in self.clips:
+            if clip.get('source_id'):
+                sources[clip['source_id']] = clip['path']
+                clip = {key: value for key, value in clip.items() if key != 'path'}
+            clips.append(clip)
+        return dict(self.to_dict(), clips=clips, sources=sources)
+
+def get_player_registry():
+    """Load the registered players on first use, off the startup path"""
+    global player_registry
+    with player_registry_lock:
+        if player_registry is None:
+            registry = PlayerRegistry(deadline=MPC_HC_DEADLINE, freshness=MPC_HC_FRESHNESS,
+                                      registry_file=PLAYER_REGISTRY_FILE)
+            # The default player comes from the configuration, not the registry file
+            registry.register(DEFAULT_PLAYER_ID, MPC_HC_BASE_URL, 'MPC-HC', persist=False)
+            player_registry = registry
+    return player_registry
+
+def get_source_registry():
+    """Load the source cache on first use, off the startup path"""
+    global source_registry
+    with source_registry_lock:
+        if source_registry is None:
+            source_registry = SourceRegistry(SOURCE_CACHE_FILE)
+    return source_registry
+
+def get_search_index():
+    """Open the search index on first use"""
+    global search_index
+    with search_index_lock:
+        if search_index is None:
+            search_index = SearchIndex(SEARCH_INDEX_FILE)
+    return search_index
+
 def create_auto_save_dir():
     """Create auto-save directory if it doesn't exist"""
     if not os.path.exists(AUTO_SAVE_DIR):
@@ -86,19 +274,103 @@ def cleanup_old_auto_saves():
             file_time = datetime.datetime.fromtimestamp(os.path.getmtime(file_path))
             if file_time < cutoff_date:
                 os.remove(file_path)
+                with auto_save_cache_lock:
+                    auto_save_cache.pop(file_path, None)
+                get_search_index().remove_file(file_path)
                 print(f"Removed old auto-save file: {file_path}")
     except Exception as e:
         print(f"Error cleaning up old auto-saves: {e}")
 
+def read_auto_save_summary(file_path):
+    """Return the listing summary of an auto-save file, re-reading only if it changed"""
+    file_stat = os.stat(file_path)
+    with auto_save_cache_lock:
+        cached = auto_save_cache.get(file_path)
+    if cached and cached[0] == (file_stat.st_mtime, file_stat.st_size):
+        return cached[1]
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    summary = {
+        'file_path': file_path,
+        'filename': os.path.basename(file_path),
+        'session_id': data.get('session_id', 'unknown'),
+        'clips_count': len(data.get('clips', [])),
+        'last_modified': datetime.datetime.fromtimestamp(file_stat.st_mtime).isoformat(),
+        'created_at': data.get('created_at', 'unknown')
+    }
+    with auto_save_cache_lock:
+        auto_save_cache[file_path] = ((file_stat.st_mtime, file_stat.st_size), summary)
+    return summary
+
+def scan_auto_saves():
+    """Warm the auto-save summary cache and index auto-saves that changed"""
+    index = get_search_index()
+    for file_path in glob.glob(os.path.join(AUTO_SAVE_DIR, "*.json")):
+        try:
+            read_auto_save_summary(file_path)
+            index.index_file(file_path)
+        except Exception as e:
+            print(f"Error reading auto-save file {file_path}: {e}")
+
+def run_housekeeping():
+    """Clean up old auto-saves and pre-scan the rest"""
+    housekeeping_state['status'] = 'running'
+    started = time.perf_counter()
+    cleanup_old_auto_saves()
+    scan_auto_saves()
+    housekeeping_state['status'] = 'done'
+    print(f"Startup housekeeping finished in {time.perf_counter() - started:.3f}s")
+
+def start_housekeeping():
+    """Start housekeeping once, in a background thread"""
+    with housekeeping_lock:
+        if housekeeping_state['started']:
+            return
+        housekeeping_state['started'] = True
+    threading.Thread(target=run_housekeeping, daemon=True).start()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Count and time the request under its route pattern, not the raw path"""
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, route)
+        HTTP_REQUESTS.inc(request.method, route, str(response.status_code))
+    return response
+
+@app.before_request
+def ensure_housekeeping_started():
+    """Defer housekeeping until the server is actually serving requests"""
+    if not housekeeping_state['started']:
+        start_housekeeping()
+
 def auto_save_session(session):
     """Auto-save session to file"""
     try:
         create_auto_save_dir()
-        if session.clips:  # Only save if there are clips
-            auto_save_file = os.path.join(AUTO_SAVE_DIR, f"{session.session_id}.json")
-            with open(auto_save_file, 'w', encoding='utf-8') as f:
-                json.dump(session.to_dict(), f, ensure_ascii=False, indent=4)
+        auto_save_file = os.path.join(AUTO_SAVE_DIR, f"{session.session_id}.json")
+        # Only save if there are clips, or the session was saved before and is now empty:
+        # the file and the search index must not keep the deleted clips
+        if session.clips or os.path.exists(auto_save_file):
+            started = time.perf_counter()
+            data = session.to_storage_dict()
+            # Compact output goes through the C encoder; indent would not
+            payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            with open(auto_save_file, 'wb') as f:
+                f.write(payload)
+            AUTO_SAVE_SECONDS.observe(time.perf_counter() - started)
+            AUTO_SAVE_BYTES.observe(len(payload))
+            get_search_index().index_session_async(
+                data, auto_save_file, os.path.getmtime(auto_save_file))
     except Exception as e:
+        AUTO_SAVE_FAILURES.inc()
         print(f"Error during auto-save: {e}")
 
 @app.route('/api/health', methods=['GET'])
@@ -107,9 +379,16 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'message': 'Flask backend is running',
-        'timestamp': datetime.datetime.now().isoformat()
+        'timestamp': datetime.datetime.now().isoformat(),
+        'uptime': round(time.perf_counter() - STARTED_AT, 3),
+        'housekeeping': housekeeping_state['status']
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Metrics in the Prometheus text exposition format"""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/session/new', methods=['POST'])
 def create_new_session():
     """Create a new clip session"""
@@ -137,82 +416,189 @@ def get_session(session_id):
         'data': session.to_dict()
     })
 
+def resolve_player():
+    """Pick the player for this request: ?player_id=, else the ?session_id= binding, else the default"""
+    player_id = request.args.get('player_id')
+    if not player_id:
+        session = session_data.get(request.args.get('session_id'))
+        player_id = session.player_id if session else DEFAULT_PLAYER_ID
+    return get_player_registry().get(player_id)
+
+def player_not_found_response():
+    return jsonify({
+        'success': False,
+        'error': '播放器不存在'
+    }), 404
+
+def mpc_error_response(error):
+    """Turn an MPC-HC failure into a JSON error, carrying the last known state"""
+    body = {
+        'success': False,
+        'error': str(error)
+    }
+    if error.last_known is not None:
+        body['last_known'] = error.last_known
+    return jsonify(body), 503 if isinstance(error, MpcUnavailableError) else 400
+
 @app.route('/api/mpc/timestamp', methods=['GET'])
 def get_mpc_timestamp():
-    """Get current timestamp from MPC-HC"""
+    """Get the MPC-HC position at the client's keypress
+
+    Optional query parameter `client_time`: keypress time in epoch milliseconds.
+    Without it the time this request arrived is used.
+    """
+    received_at = time.time()
+    client_time = request.args.get('client_time', type=float)
+    mark_time = client_time / 1000 if client_time else received_at
+
     try:
-        response = requests.get(MPC_HC_INFO_URL, timeout=5)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'html.parser')
-            info_text = soup.find(id='mpchc_np').get_text()
-            parts = info_text.strip('«»').split('•')
-            
-            if len(parts) >= 3:
-                file_name = parts[1].strip()
-                current_position = parts[2].split('/')[0].strip()
-                
-                return jsonify({
-                    'success': True,
-                    'data': {
-                        'file_name': file_name,
-                        'current_position': current_position,
-                        'timestamp': datetime.datetime.now().isoformat()
-                    }
-                })
-            else:
-                return jsonify({
-                    'success': False,
-                    'error': '無法解析 MPC-HC 回應'
-                }), 400
-        else:
-            return jsonify({
-                'success': False,
-                'error': f'MPC-HC 回應錯誤: HTTP {response.status_code}'
-            }), 400
-            
-    except requests.RequestException as e:
-        return jsonify({
-            'success': False,
-            'error': f'無法連接到 MPC-HC: {str(e)}'
-        }), 500
+        mark = resolve_player().position_at(mark_time)
+    except KeyError:
+        return player_not_found_response()
+    except MpcError as e:
+        return mpc_error_response(e)
+
+    return jsonify({
+        'success': True,
+        'data': {
+            'file_name': mark['file_name'],
+            'current_position': format_position(mark['position_ms']),
+            'precise_position': format_position(mark['position_ms'], precise=True),
+            'position_ms': mark['position_ms'],
+            'compensation': {
+                'applied_ms': mark['compensation_ms'],
+                'error_ms': mark['error_ms'],
+                'rtt_ms': mark['rtt_ms'],
+                'reported_position_ms': mark['reported_position_ms'],
+                'playing': mark['playing'],
+                'playback_rate': mark['playback_rate'],
+                'client_time_used': mark['mark_time_used'] and client_time is not None
+            },
+            'timestamp': datetime.datetime.now().isoformat()
+        }
+    })
 
 @app.route('/api/mpc/filepath', methods=['GET'])
 def get_mpc_filepath():
     """Get current file path from MPC-HC"""
     try:
-        response = requests.get(MPC_HC_VARIABLES_URL, timeout=5)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            file_path_element = soup.find(id='filepath')
-            
-            if file_path_element:
-                file_path = file_path_element.text
-                # Convert encoding
-                decoded_str = file_path.encode('latin1').decode('utf-8')
-                
-                return jsonify({
-                    'success': True,
-                    'data': {
-                        'file_path': decoded_str,
-                        'timestamp': datetime.datetime.now().isoformat()
-                    }
-                })
-            else:
-                return jsonify({
-                    'success': False,
-                    'error': '無法找到檔案路徑元素'
-                }), 400
-        else:
+        variables = resolve_player().variables()
+    except KeyError:
+        return player_not_found_response()
+    except MpcError as e:
+        return mpc_error_response(e)
+
+    return jsonify({
+        'success': True,
+        'data': {
+            'file_path': variables['file_path'],
+            'timestamp': datetime.datetime.now().isoformat()
+        }
+    })
+
+@app.route('/api/mpc/status', methods=['GET'])
+def get_mpc_status():
+    """Get MPC-HC reachability as seen by the circuit breaker"""
+    try:
+        player = resolve_player()
+    except KeyError:
+        return player_not_found_response()
+
+    return jsonify({
+        'success': True,
+        'data': player.status()
+    })
+
+@app.route('/api/players', methods=['GET'])
+def list_players():
+    """Poll every registered MPC-HC instance concurrently"""
+    return jsonify({
+        'success': True,
+        'data': get_player_registry().poll_all()
+    })
+
+@app.route('/api/players', methods=['POST'])
+def register_player():
+    """Register an MPC-HC instance by URL or port"""
+    data = request.get_json()
+    if not data or not (data.get('url') or data.get('port')):
+        return jsonify({
+            'success': False,
+            'error': '缺少必要欄位'
+        }), 400
+
+    if data.get('url'):
+        base_url = data['url']
+    else:
+        try:
+            port = int(data['port'])
+        except (TypeError, ValueError):
             return jsonify({
                 'success': False,
-                'error': f'MPC-HC 回應錯誤: HTTP {response.status_code}'
+                'error': '無效的連接埠'
             }), 400
-            
-    except requests.RequestException as e:
+        base_url = f"http://{data.get('host', '127.0.0.1')}:{port}"
+
+    # Ids end up in URL paths: host:port only, with anything but word characters as '-'
+    player_id = data.get('id') or urlsplit(base_url).netloc or base_url
+    player_id = re.sub(r'\W+', '-', player_id).strip('-')
+    if not player_id:
         return jsonify({
             'success': False,
-            'error': f'無法連接到 MPC-HC: {str(e)}'
-        }), 500
+            'error': '無效的播放器 ID'
+        }), 400
+    registry = get_player_registry()
+    entry = registry.register(player_id, base_url, data.get('name'))
+
+    return jsonify({
+        'success': True,
+        'data': registry.describe(entry),
+        'message': '播放器已註冊'
+    })
+
+@app.route('/api/players/<player_id>', methods=['DELETE'])
+def unregister_player(player_id):
+    """Remove a registered MPC-HC instance"""
+    if player_id == DEFAULT_PLAYER_ID or not get_player_registry().unregister(player_id):
+        return jsonify({
+            'success': False,
+            'error': '無法移除此播放器'
+        }), 400
+
+    for session in session_data.values():
+        if session.player_id == player_id:
+            session.player_id = DEFAULT_PLAYER_ID
+
+    return jsonify({
+        'success': True,
+        'message': '播放器已移除'
+    })
+
+@app.route('/api/session/<session_id>/player', methods=['PUT'])
+def bind_session_player(session_id):
+    """Bind a session to one registered player"""
+    if session_id not in session_data:
+        return jsonify({
+            'success': False,
+            'error': '會話不存在'
+        }), 404
+
+    data = request.get_json() or {}
+    player_id = data.get('player_id')
+    try:
+        get_player_registry().get(player_id)
+    except KeyError:
+        return player_not_found_response()
+
+    session = session_data[session_id]
+    session.player_id = player_id
+    auto_save_session(session)
+
+    return jsonify({
+        'success': True,
+        'data': session.to_dict(),
+        'message': '播放器已綁定'
+    })
 
 @app.route('/api/clips/<session_id>', methods=['POST'])
 def add_clip(session_id):
@@ -241,14 +627,8 @@ def add_clip(session_id):
     
     # Get file path from MPC-HC
     try:
-        file_path_response = get_mpc_filepath()
-        file_path_data = file_path_response.get_json()
-        
-        if file_path_data['success']:
-            file_path = file_path_data['data']['file_path']
-        else:
-            file_path = None
-    except:
+        file_path = get_player_registry().get(session.player_id).file_path()
+    except (KeyError, MpcError):
         file_path = None
     
     clip_data = {
@@ -261,11 +641,21 @@ def add_clip(session_id):
     
     session.add_clip(clip_data)
     auto_save_session(session)
+    overlaps = session.clips_by_ids(session.index.overlaps_for(clip_data))
+
+    # Validate against cached source metadata, never probing on the request path
+    warnings = []
+    duration = get_source_registry().duration(clip_data.get('source_id'))
+    end_seconds = parse_time(clip_data['end_time'])
+    if duration and end_seconds is not None and end_seconds > duration + 0.5:
+        warnings.append(f'結束時間超過影片長度 ({format_position(duration * 1000)})')
     
     return jsonify({
         'success': True,
         'data': clip_data,
-        'message': '片段已新增'
+        'overlaps': overlaps,
+        'warnings': warnings,
+        'message': '片段已新增' if not overlaps else f'片段已新增（與 {len(overlaps)} 個片段重疊）'
     })
 
 @app.route('/api/clips/<session_id>/<int:clip_index>', methods=['PUT'])
@@ -321,6 +711,349 @@ def remove_clip(session_id, clip_index):
             'error': '片段索引無效'
         }), 400
 
+def session_not_found_response():
+    return jsonify({
+        'success': False,
+        'error': '會話不存在'
+    }), 404
+
+@app.route('/api/clips/<session_id>/range', methods=['GET'])
+def query_clip_range(session_id):
+    """Clips overlapping a time range, optionally within one source file"""
+    if session_id not in session_data:
+        return session_not_found_response()
+
+    start = parse_time(request.args.get('start', '0'))
+    end = parse_time(request.args.get('end', '')) if request.args.get('end') else float('inf')
+    if start is None or end is None or end < start:
+        return jsonify({
+            'success': False,
+            'error': '時間格式錯誤'
+        }), 400
+
+    session = session_data[session_id]
+    clip_ids = session.index.query(start, end, request.args.get('source'))
+    return jsonify({
+        'success': True,
+        'data': session.clips_by_ids(clip_ids)
+    })
+
+@app.route('/api/clips/<session_id>/import', methods=['POST'])
+def import_clips(session_id):
+    """Import clips from a JSON, JSON Lines, CSV or EDL file
+
+    The file is either a multipart upload (`file`) or the raw request body.
+    Query parameters: format (detected from the file name or content if
+    omitted), path (source for entries without one), fps (EDL timecodes),
+    mode (append or replace). Source paths come from the file, never from
+    the player, and the session is saved once at the end.
+    """
+    if session_id not in session_data:
+        return session_not_found_response()
+
+    session = session_data[session_id]
+    upload = request.files.get('file')
+    if upload is not None:
+        stream, filename = upload.stream, upload.filename
+    else:
+        stream, filename = request.stream, request.args.get('filename')
+
+    file_format = request.args.get('format')
+    if not file_format:
+        if not hasattr(stream, 'peek'):
+            stream = io.BufferedReader(stream)
+        head = stream.peek(1024)[:1024].decode('utf-8-sig', 'ignore')
+        file_format = detect_format(filename, head)
+    if file_format not in IMPORT_FORMATS:
+        return jsonify({
+            'success': False,
+            'error': f'不支援的格式: {file_format}'
+        }), 400
+
+    mode = request.args.get('mode', 'append')
+    fps = request.args.get('fps', 30.0, type=float)
+    if mode not in ('append', 'replace') or not fps or fps <= 0:
+        return jsonify({
+            'success': False,
+            'error': '無效的請求參數'
+        }), 400
+
+    started = time.perf_counter()
+    try:
+        clips, skipped, errors = read_clips(
+            stream, file_format, default_path=request.args.get('path'), fps=fps)
+    except (ClipImportError, UnicodeDecodeError) as e:
+        return jsonify({
+            'success': False,
+            'error': f'匯入失敗: {str(e)}'
+        }), 400
+
+    if mode == 'replace':
+        session.set_clips(clips)
+        session.last_modified = datetime.datetime.now()
+    else:
+        session.add_clips(clips)
+    auto_save_session(session)
+
+    return jsonify({
+        'success': True,
+        'data': {
+            'format': file_format,
+            'imported': len(clips),
+            'skipped': skipped,
+            'errors': errors,
+            'clips_count': len(session.clips)
+        },
+        'took_ms': round((time.perf_counter() - started) * 1000, 1),
+        'message': f'已匯入 {len(clips)} 個片段' + (f'（略過 {skipped} 筆）' if skipped else '')
+    })
+
+@app.route('/api/clips/<session_id>/overlaps', methods=['GET'])
+def list_clip_overlaps(session_id):
+    """All pairs of overlapping clips in the session, per source file"""
+    if session_id not in session_data:
+        return session_not_found_response()
+
+    session = session_data[session_id]
+    pairs = []
+    for source, first_id, second_id in session.index.overlapping_pairs():
+        pairs.append({
+            'source': source or None,
+            'clips': session.clips_by_ids([first_id, second_id])
+        })
+    return jsonify({
+        'success': True,
+        'data': pairs
+    })
+
+@app.route('/api/clips/<session_id>/merge', methods=['POST'])
+def merge_clips(session_id):
+    """Merge clips: the given indices, or every run of clips at most max_gap seconds apart"""
+    if session_id not in session_data:
+        return session_not_found_response()
+
+    session = session_data[session_id]
+    data = request.get_json() or {}
+
+    if 'indices' in data:
+        try:
+            clip_ids = [session.clips[int(i)]['id'] for i in data['indices']]
+        except (IndexError, TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'error': '片段索引無效'
+            }), 400
+        clip_ids = list(dict.fromkeys(clip_ids))
+        bounds = [session.index.bounds.get(clip_id) for clip_id in clip_ids]
+        if None in bounds or len({source for source, _, _ in bounds}) != 1:
+            return jsonify({
+                'success': False,
+                'error': '只能合併同一來源且時間有效的片段'
+            }), 400
+        groups = [clip_ids] if len(clip_ids) > 1 else []
+    else:
+        try:
+            max_gap = float(data.get('max_gap', 0))
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'error': '無效的請求資料'
+            }), 400
+        groups = session.index.merge_groups(max_gap, data.get('source'))
+
+    merged = []
+    for group in groups:
+        clips = [session.clips[session.clip_position(clip_id)] for clip_id in group]
+        first = min(clips, key=lambda clip: session.index.bounds[clip['id']][1])
+        last = max(clips, key=lambda clip: session.index.bounds[clip['id']][2])
+        merged_clip = dict(first, end_time=last['end_time'])
+
+        for clip_id in group:
+            if clip_id != first['id']:
+                session.remove_clip(session.clip_position(clip_id))
+        session.update_clip(session.clip_position(first['id']), merged_clip)
+        merged.append(merged_clip)
+
+    if merged:
+        auto_save_session(session)
+
+    return jsonify({
+        'success': True,
+        'data': merged,
+        'message': f'已合併 {len(merged)} 組片段'
+    })
+
+@app.route('/api/clips/<session_id>/<int:clip_index>/split', methods=['POST'])
+def split_clip(session_id, clip_index):
+    """Split a clip in two at the given time"""
+    if session_id not in session_data:
+        return session_not_found_response()
+
+    session = session_data[session_id]
+    data = request.get_json() or {}
+    if not 0 <= clip_index < len(session.clips):
+        return jsonify({
+            'success': False,
+            'error': '片段索引無效'
+        }), 400
+
+    clip = session.clips[clip_index]
+    at = parse_time(data.get('at', ''))
+    start = parse_time(clip.get('start_time'))
+    end = parse_time(clip.get('end_time'))
+    if at is None or start is None or end is None or not start < at < end:
+        return jsonify({
+            'success': False,
+            'error': '分割時間必須在片段範圍內'
+        }), 400
+
+    at_text = format_position(at * 1000, precise=True)
+    first = dict(clip, end_time=at_text)
+    second = dict(clip, start_time=at_text, created_at=datetime.datetime.now().isoformat())
+    second.pop('id', None)
+    second['custom_name'] = data.get('second_name') or f"{clip.get('custom_name', '')}_2"
+
+    session.update_clip(clip_index, first)
+    session.add_clip(second, clip_index + 1)
+    auto_save_session(session)
+
+    return jsonify({
+        'success': True,
+        'data': [first, second],
+        'message': '片段已分割'
+    })
+
+@app.route('/api/sources', methods=['GET'])
+def list_sources():
+    """List registered source files with their cached metadata"""
+    return jsonify({
+        'success': True,
+        'data': get_source_registry().list()
+    })
+
+@app.route('/api/sources/<source_id>', methods=['GET'])
+def get_source(source_id):
+    """Get one source file's metadata, re-probing it if the file changed"""
+    if get_source_registry().get(source_id) is None:
+        return jsonify({
+            'success': False,
+            'error': '來源檔案不存在'
+        }), 404
+
+    if request.args.get('refresh'):
+        get_source_registry().refresh(source_id)
+    else:
+        get_source_registry().refresh_async(source_id)
+
+    return jsonify({
+        'success': True,
+        'data': get_source_registry().describe(source_id)
+    })
+
+def get_thumbnail_service():
+    """Create the thumbnail service on first use (scanning the cache directory takes a moment)"""
+    global thumbnail_service
+    with thumbnail_service_lock:
+        if thumbnail_service is None:
+            thumbnail_service = ThumbnailService(
+                ThumbnailCache(THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_BYTES))
+    return thumbnail_service
+
+def request_clip_thumbnail(clip, kind, width, frames, prefetch=False):
+    """Cached path or Future for one of a clip's preview images"""
+    start = parse_time(clip.get('start_time'))
+    end = parse_time(clip.get('end_time'))
+    if not clip.get('path') or start is None or end is None:
+        raise ThumbnailError('片段缺少來源檔案或時間')
+    service = get_thumbnail_service()
+    if kind == 'start':
+        return service.request(clip['path'], 'frame', start, width=width, prefetch=prefetch)
+    if kind == 'end':
+        # The last frame before the end mark
+        return service.request(clip['path'], 'frame', max(start, end - 0.05),
+                               width=width, prefetch=prefetch)
+    return service.request(clip['path'], 'strip', start, end, width=width,
+                           frames=frames, prefetch=prefetch)
+
+@app.route('/api/clips/<session_id>/<int:clip_index>/thumbnail/<kind>', methods=['GET'])
+def get_clip_thumbnail(session_id, clip_index, kind):
+    """Start/end frame or preview strip of a clip, as JPEG"""
+    if session_id not in session_data:
+        return session_not_found_response()
+    session = session_data[session_id]
+    if not 0 <= clip_index < len(session.clips) or kind not in ('start', 'end', 'strip'):
+        return jsonify({
+            'success': False,
+            'error': '片段索引無效'
+        }), 400
+
+    width = min(request.args.get('width', 320 if kind != 'strip' else 160, type=int), 1920)
+    frames = min(request.args.get('frames', 8, type=int), 32)
+    wait = request.args.get('wait', THUMBNAIL_WAIT, type=float)
+
+    try:
+        result = request_clip_thumbnail(session.clips[clip_index], kind, width, frames)
+        if not isinstance(result, str):
+            result = result.result(timeout=wait)
+    except ThumbnailError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
+    except concurrent.futures.TimeoutError:
+        # Still extracting; the client can retry and will hit the cache
+        return jsonify({
+            'success': False,
+            'pending': True,
+            'error': '縮圖產生中'
+        }), 202
+
+    response = send_file(os.path.abspath(result), mimetype='image/jpeg')
+    response.headers['Cache-Control'] = 'private, max-age=86400'
+    return response
+
+@app.route('/api/clips/<session_id>/thumbnails/prefetch', methods=['POST'])
+def prefetch_thumbnails(session_id):
+    """Queue previews for the clips currently visible in the client"""
+    if session_id not in session_data:
+        return session_not_found_response()
+    session = session_data[session_id]
+    data = request.get_json() or {}
+
+    try:
+        first = max(int(data.get('start_index', 0)), 0)
+        count = min(int(data.get('count', 20)), 200)
+        width = min(int(data.get('width', 320)), 1920)
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'error': '無效的請求資料'
+        }), 400
+    kinds = [kind for kind in data.get('kinds', ['start', 'end', 'strip'])
+             if kind in ('start', 'end', 'strip')]
+
+    queued = cached = 0
+    for clip in session.clips[first:first + count]:
+        for kind in kinds:
+            try:
+                result = request_clip_thumbnail(clip, kind, width if kind != 'strip' else width // 2,
+                                                8, prefetch=True)
+            except ThumbnailError:
+                continue
+            if isinstance(result, str):
+                cached += 1
+            else:
+                queued += 1
+
+    return jsonify({
+        'success': True,
+        'data': {
+            'queued': queued,
+            'cached': cached,
+            'cache': get_thumbnail_service().cache.stats()
+        }
+    })
+
 @app.route('/api/export/<session_id>', methods=['POST'])
 def export_clips(session_id):
     """Export clips to JSON file"""
@@ -346,8 +1079,10 @@ def export_clips(session_id):
     filepath = os.path.join(output_path, filename)
     
     try:
+        source_ids = {clip['source_id'] for clip in session.clips if clip.get('source_id')}
         export_data = {
             'clips': session.clips,
+            'sources': {source_id: get_source_registry().describe(source_id) for source_id in source_ids},
             'exported_at': datetime.datetime.now().isoformat(),
             'session_id': session.session_id
         }
@@ -405,9 +1140,21 @@ def clip_videos():
     try:
         # Start clipping in background thread
         def run_clipping():
-            VideoClipper.go(json_file, output_directory, clipping_callback)
+            started = time.perf_counter()
+            outcome = 'failed'
+            try:
+                get_video_clipper().go(json_file, output_directory, clipping_callback)
+                outcome = 'completed'
+            finally:
+                CLIPPING_JOBS.inc(outcome)
+                CLIPPING_JOB_SECONDS.observe(time.perf_counter() - started)
             
-        threading.Thread(target=run_clipping, daemon=True).start()
+        job = threading.Thread(target=run_clipping, daemon=True)
+        with clipping_jobs_lock:
+            clipping_jobs[:] = [j for j in clipping_jobs if j.is_alive()]
+            clipping_jobs.append(job)
+        job.start()
+        CLIPPING_JOBS.inc('started')
         
         return jsonify({
             'success': True,
@@ -429,18 +1176,7 @@ def list_auto_saves():
         
         for file_path in glob.glob(os.path.join(AUTO_SAVE_DIR, "*.json")):
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                file_stat = os.stat(file_path)
-                auto_saves.append({
-                    'file_path': file_path,
-                    'filename': os.path.basename(file_path),
-                    'session_id': data.get('session_id', 'unknown'),
-                    'clips_count': len(data.get('clips', [])),
-                    'last_modified': datetime.datetime.fromtimestamp(file_stat.st_mtime).isoformat(),
-                    'created_at': data.get('created_at', 'unknown')
-                })
+                auto_saves.append(read_auto_save_summary(file_path))
             except Exception as e:
                 print(f"Error reading auto-save file {file_path}: {e}")
                 
@@ -458,6 +1194,46 @@ def list_auto_saves():
             'error': f'讀取自動儲存檔案失敗: {str(e)}'
         }), 500
 
+@app.route('/api/search', methods=['GET'])
+def search_clips():
+    """Search clips of every session and auto-save by name/path prefix, with filters
+
+    Query parameters: q, session_id, source, from / to (ISO dates on clip creation, a
+    date-only `to` includes that day),
+    start / end (time range within the source), limit, offset.
+    """
+    start = parse_time(request.args['start']) if request.args.get('start') else None
+    end = parse_time(request.args['end']) if request.args.get('end') else None
+    if (request.args.get('start') and start is None) or (request.args.get('end') and end is None):
+        return jsonify({
+            'success': False,
+            'error': '時間格式錯誤'
+        }), 400
+
+    try:
+        results, elapsed = get_search_index().search(
+            query=request.args.get('q', ''),
+            session_id=request.args.get('session_id'),
+            source=request.args.get('source'),
+            created_from=request.args.get('from'),
+            created_to=request.args.get('to'),
+            start=start,
+            end=end,
+            limit=min(max(request.args.get('limit', 50, type=int), 1), 500),
+            offset=max(request.args.get('offset', 0, type=int), 0)
+        )
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'搜尋失敗: {str(e)}'
+        }), 500
+
+    return jsonify({
+        'success': True,
+        'data': results,
+        'took_ms': round(elapsed * 1000, 2)
+    })
+
 @app.route('/api/auto-saves/<filename>', methods=['GET'])
 def load_auto_save(filename):
     """Load an auto-save file"""
@@ -476,7 +1252,19 @@ def load_auto_save(filename):
         # Create new session from auto-save data
         session = ClipSession()
         session.session_id = data.get('session_id', session.session_id)
-        session.clips = data.get('clips', [])
+        clips = data.get('clips', [])
+        sources = data.get('sources', {})
+        for clip in clips:
+            if not clip.get('path') and clip.get('source_id') in sources:
+                clip['path'] = sources[clip['source_id']]
+        session.set_clips(clips)
+        warnings = []
+        if data.get('player_id') in get_player_registry():
+            session.player_id = data['player_id']
+        elif data.get('player_id'):
+            # The player it was bound to is no longer registered
+            print(f"Auto-save {filename}: unknown player {data['player_id']}, using the default player")
+            warnings.append(f"播放器 {data['player_id']} 不存在，已改用預設播放器")
         
         if 'created_at' in data:
             session.created_at = datetime.datetime.fromisoformat(data['created_at'])
@@ -488,6 +1276,7 @@ def load_auto_save(filename):
         return jsonify({
             'success': True,
             'data': session.to_dict(),
+            'warnings': warnings,
             'message': '自動儲存檔案已載入'
         })
         
@@ -497,10 +1286,136 @@ def load_auto_save(filename):
             'error': f'載入自動儲存檔案失敗: {str(e)}'
         }), 500
 
-# Initialize on startup
-cleanup_old_auto_saves()
+def shutdown_backend(drain_timeout=30.0):
+    """Flush every session to disk and wait for running clipping jobs"""
+    print("Shutting down: flushing auto-saves...")
+    for session in list(session_data.values()):
+        auto_save_session(session)
+
+    with clipping_jobs_lock:
+        jobs = [job for job in clipping_jobs if job.is_alive()]
+    if jobs:
+        print(f"Waiting for {len(jobs)} clipping job(s) to finish...")
+        deadline = time.monotonic() + drain_timeout
+        for job in jobs:
+            job.join(max(0.0, deadline - time.monotonic()))
+        unfinished = sum(1 for job in jobs if job.is_alive())
+        if unfinished:
+            print(f"{unfinished} clipping job(s) still running, exiting anyway")
+    if search_index is not None:
+        search_index.flush()
+    if player_registry is not None:
+        player_registry.close()
+    print("Shutdown complete")
+
+def handle_shutdown_signal(signum, frame):
+    """Turn SIGTERM/SIGBREAK into the same path as Ctrl+C"""
+    raise KeyboardInterrupt
+
+# Set by serve_production: stops the server loop so shutdown_backend runs
+request_server_stop = None
+
+@app.route('/api/shutdown', methods=['POST'])
+def request_shutdown():
+    """Drain and stop the backend; the Electron shell calls this instead of killing the process
+
+    Only accepted from the local machine and under the production server.
+    """
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({
+            'success': False,
+            'error': '只接受本機的關閉請求'
+        }), 403
+    if request_server_stop is None:
+        return jsonify({
+            'success': False,
+            'error': '開發伺服器不支援遠端關閉'
+        }), 409
+
+    # Let this response go out before the server loop stops
+    threading.Timer(0.1, request_server_stop).start()
+    return jsonify({
+        'success': True,
+        'message': '後端正在關閉'
+    })
+
+def create_production_server(args):
+    """Create a multi-threaded WSGI server, preferring waitress"""
+    try:
+        from waitress import create_server
+    except ImportError:
+        from werkzeug.serving import ThreadedWSGIServer
+        print("waitress not installed, falling back to threaded werkzeug server "
+              "(--threads, --keep-alive and --connection-limit do not apply)")
+
+        # listen() runs in the constructor, so the backlog has to be set on the class
+        class BacklogWSGIServer(ThreadedWSGIServer):
+            request_queue_size = args.backlog
+
+        app.config['MAX_CONTENT_LENGTH'] = args.max_request_body
+        server = BacklogWSGIServer(args.host, args.port, app)
+        return server.serve_forever, 'the threaded werkzeug server'
+
+    server = create_server(
+        app,
+        host=args.host,
+        port=args.port,
+        threads=args.threads,
+        channel_timeout=args.keep_alive,
+        connection_limit=args.connection_limit,
+        max_request_body_size=args.max_request_body,
+        backlog=args.backlog,
+        ident='clip-marker'
+    )
+    return server.run, f'waitress ({args.threads} threads)'
+
+def serve_production(args):
+    """Serve the API with a production WSGI server and shut down gracefully"""
+    global request_server_stop
+    signal.signal(signal.SIGTERM, handle_shutdown_signal)
+    if hasattr(signal, 'SIGBREAK'):
+        signal.signal(signal.SIGBREAK, handle_shutdown_signal)
+
+    run_server, description = create_production_server(args)
+    # Runs handle_shutdown_signal in the main thread, which runs the server loop
+    request_server_stop = lambda: signal.raise_signal(signal.SIGTERM)
+    # The socket is bound at this point, so housekeeping no longer delays readiness
+    start_housekeeping()
+    print(f"Serving on http://{args.host}:{args.port} using {description} "
+          f"(ready in {time.perf_counter() - STARTED_AT:.3f}s)")
+    try:
+        run_server()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_backend(args.drain_timeout)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Clip Marker Flask backend')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--dev', action='store_true',
+                        default=os.environ.get('FLASK_ENV') == 'development',
+                        help='Run the Flask debug server with the reloader')
+    parser.add_argument('--threads', type=int, default=8,
+                        help='Worker threads handling requests')
+    parser.add_argument('--keep-alive', type=int, default=30,
+                        help='Seconds an idle keep-alive connection is kept open')
+    parser.add_argument('--connection-limit', type=int, default=100,
+                        help='Maximum number of simultaneous connections')
+    parser.add_argument('--max-request-body', type=int, default=64 * 1024 * 1024,
+                        help='Maximum request body size in bytes')
+    parser.add_argument('--backlog', type=int, default=64,
+                        help='Listen backlog of the server socket')
+    parser.add_argument('--drain-timeout', type=float, default=30.0,
+                        help='Seconds to wait for clipping jobs on shutdown')
+    return parser.parse_args(argv)
 
 if __name__ == '__main__':
+    args = parse_args()
     print("Starting Flask backend server...")
     print(f"Auto-save directory: {AUTO_SAVE_DIR}")
-    app.run(host='127.0.0.1', port=5000, debug=True)
\ No newline at end of file
+    if args.dev:
+        app.run(host=args.host, port=args.port, debug=True)
+    else:
+        serve_production(args)
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""Measure backend cold start: module import time and process start to first healthy response.
+
+Usage: python bench_startup.py [--runs N] [--port PORT]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+# The backend imports from BACKEND_DIR but runs in a scratch directory, so
+# auto-saves and caches never land in the source tree
+BACKEND_ENV = dict(os.environ, PYTHONPATH=os.pathsep.join(
+    filter(None, [BACKEND_DIR, os.environ.get('PYTHONPATH')])))
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import app; "
+    "print(time.perf_counter() - t)"
+)
+
+SERVE_SNIPPET = (
+    "import app; "
+    "app.app.run(host='127.0.0.1', port={port}, debug=False, use_reloader=False)"
+)
+
+
+def measure_import():
+    """Time `import app` in a fresh interpreter"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        output = subprocess.check_output(
+            [sys.executable, "-c", IMPORT_SNIPPET], cwd=work_dir, env=BACKEND_ENV, text=True)
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_ready(port, timeout=30.0):
+    """Time from process spawn until /api/health answers"""
+    url = f"http://127.0.0.1:{port}/api/health"
+    with tempfile.TemporaryDirectory() as work_dir:
+        return _measure_ready(url, work_dir, port, timeout)
+
+
+def _measure_ready(url, work_dir, port, timeout):
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", SERVE_SNIPPET.format(port=port)],
+        cwd=work_dir, env=BACKEND_ENV, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    health = json.load(response)
+                    return time.perf_counter() - started, health.get('uptime')
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"backend did not become ready within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    readies = [measure_ready(args.port) for _ in range(args.runs)]
+
+    print(f"import app:          median {statistics.median(imports) * 1000:7.1f} ms")
+    print(f"spawn -> healthy:    median {statistics.median(r[0] for r in readies) * 1000:7.1f} ms")
+    print(f"import -> healthy:   median {statistics.median(r[1] for r in readies) * 1000:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+import csv
+import datetime
+import io
+import json
+import os
+import re
+
+from clip_index import parse_time
+from player_state import format_position
+
+
+CHUNK_SIZE = 64 * 1024
+# Largest single JSON value (one clip, or a top-level table) read into memory
+MAX_VALUE_SIZE = 16 * 1024 * 1024
+FORMATS = ('json', 'jsonl', 'csv', 'edl')
+
+# Accepted column / key names, first match wins
+START_KEYS = ('start_time', 'start', 'in', 'start time')
+END_KEYS = ('end_time', 'end', 'out', 'end time')
+NAME_KEYS = ('custom_name', 'name', 'title', 'clip_name')
+PATH_KEYS = ('path', 'source', 'file', 'file_path', 'source_path')
+
+EDL_EVENT = re.compile(
+    r'^(\d+)\s+(\S+)\s+(\S+)\s+(\S+)(?:\s+\d+)?\s+'
+    r'(\d{2}:\d{2}:\d{2}[:;.]\d{2})\s+(\d{2}:\d{2}:\d{2}[:;.]\d{2})\s+'
+    r'(\d{2}:\d{2}:\d{2}[:;.]\d{2})\s+(\d{2}:\d{2}:\d{2}[:;.]\d{2})')
+
+
+class ClipImportError(Exception):
+    """The import file is malformed beyond skipping single entries"""
+
+
+def detect_format(filename=None, head=''):
+    """Guess the format from the file extension, else from the first characters"""
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if extension in ('json', 'jsonl', 'csv', 'edl'):
+        return extension
+    if extension == 'ndjson':
+        return 'jsonl'
+    stripped = head.lstrip()
+    if stripped.startswith('['):
+        return 'json'
+    if stripped.startswith('{'):
+        first_line = stripped.split('\n', 1)[0]
+        try:
+            json.loads(first_line)
+            return 'jsonl'
+        except ValueError:
+            return 'json'
+    if stripped.upper().startswith(('TITLE:', 'FCM:')) or EDL_EVENT.match(stripped):
+        return 'edl'
+    return 'csv'
+
+
+def pick(entry, keys):
+    for key in keys:
+        value = entry.get(key)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def timecode_to_seconds(timecode, fps, drop_frame=False):
+    """HH:MM:SS:FF at `fps` frames per second.
+
+    Timecode counts `round(fps)` frames per second, so the frame count is divided
+    by the real rate (29.97 NDF runs slower than the clock). Drop-frame timecode
+    (a `;` separator or drop_frame) skips frame numbers 0 and 1 (0-3 at 59.94) each
+    minute except every tenth, and runs at 30000/1001 (or 60000/1001).
+    """
+    hours, minutes, seconds, frames = (int(part) for part in re.split(r'[:;.]', timecode))
+    nominal = round(fps)
+    count = (hours * 3600 + minutes * 60 + seconds) * nominal + frames
+    if drop_frame or ';' in timecode:
+        if nominal not in (30, 60):
+            raise ClipImportError(f'不支援 {fps} fps 的 drop-frame 時間碼')
+        dropped = nominal // 15  # 2 at 29.97, 4 at 59.94
+        total_minutes = hours * 60 + minutes
+        count -= dropped * (total_minutes - total_minutes // 10)
+        return count * 1001 / (nominal * 1000)
+    return count / fps
+
+
+def normalize_time(value):
+    """Seconds as HH:MM:SS, with milliseconds only when they are not zero"""
+    millis = round(value * 1000)
+    return format_position(millis, precise=millis % 1000 != 0)
+
+
+class JsonStreamReader:
+    """Walks a JSON document incrementally and yields the clip objects of its clip array.
+
+    Accepts a bare array of clips or an object with a `clips` array (our own
+    exports and auto-saves). Only one clip is decoded at a time; other
+    top-level values are decoded whole, and a `sources` table is kept so clips
+    stored by source id can get their path back.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.sources = {}
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.stream.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _skip_whitespace(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return
+
+    def _peek(self):
+        self._skip_whitespace()
+        if self.pos >= len(self.buffer):
+            raise ClipImportError('JSON 檔案不完整')
+        return self.buffer[self.pos]
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ClipImportError(f'JSON 格式錯誤: 預期 {char!r}')
+        self.pos += 1
+
+    def _value(self):
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                # A value cut off at the end of the buffer fails within a few characters of
+                # the end (a literal or \u escape), or as a string never closed; read more and
+                # retry. Anything else is a real syntax error and fails without reading on.
+                truncated = len(self.buffer) - e.pos <= 5 or e.msg.startswith('Unterminated string')
+                if truncated and len(self.buffer) - self.pos < MAX_VALUE_SIZE and self._fill():
+                    continue
+                raise ClipImportError(f'JSON 格式錯誤: {e.msg}')
+            # A number at the buffer end may continue in the next chunk
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def _array(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self._value()
+            char = self._peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ClipImportError('JSON 格式錯誤: 預期 , 或 ]')
+
+    def __iter__(self):
+        if self._peek() == '[':
+            yield from self._array()
+            return
+
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._value()
+            self._expect(':')
+            if key == 'clips' and self._peek() == '[':
+                yield from self._array()
+            else:
+                value = self._value()
+                if key == 'sources' and isinstance(value, dict):
+                    self.sources.update(value)
+            char = self._peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ClipImportError('JSON 格式錯誤: 預期 , 或 }')
+
+
+def iter_jsonl(stream):
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield ValueError(f'第 {line_number} 行: {e}')
+
+
+def iter_csv(stream):
+    reader = csv.reader(stream)
+    header = None
+    for row in reader:
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        if header is None:
+            header = [cell.strip().lower() for cell in row]
+            continue
+        yield dict(zip(header, row))
+
+
+def iter_edl(stream, fps=30.0):
+    """Events of a CMX3600 EDL; the source in/out become the clip bounds.
+
+    The clip name comes from `* FROM CLIP NAME:` (or a `* COMMENT:`), the path
+    from `* SOURCE FILE:`, falling back to the reel name.
+    """
+    event = None
+    drop_frame = False
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        if line.upper().startswith('FCM:'):
+            drop_frame = line.split(':', 1)[1].strip().upper() == 'DROP FRAME'
+            continue
+        match = EDL_EVENT.match(line)
+        if match:
+            if event:
+                yield event
+            number, reel = match.group(1), match.group(2)
+            event = {
+                'start_time': timecode_to_seconds(match.group(5), fps, drop_frame),
+                'end_time': timecode_to_seconds(match.group(6), fps, drop_frame),
+                'custom_name': f'Event {number}',
+                'path': None if reel.upper() in ('AX', 'BL', 'BLACK') else reel
+            }
+            continue
+        if event is None or not line.startswith('*'):
+            continue
+        comment = line.lstrip('*').strip()
+        label, _, value = comment.partition(':')
+        label = label.strip().upper()
+        value = value.strip()
+        if label == 'FROM CLIP NAME' and value:
+            event['custom_name'] = value
+        elif label == 'COMMENT' and value:
+            event['custom_name'] = value
+        elif label == 'SOURCE FILE' and value:
+            event['path'] = value
+    if event:
+        yield event
+
+
+def iter_entries(stream, file_format, fps=30.0):
+    """Raw entries of a text stream; the JSON reader is returned so its sources table stays reachable"""
+    if file_format == 'json':
+        return JsonStreamReader(stream)
+    if file_format == 'jsonl':
+        return iter_jsonl(stream)
+    if file_format == 'csv':
+        return iter_csv(stream)
+    if file_format == 'edl':
+        return iter_edl(stream, fps)
+    raise ClipImportError(f'不支援的格式: {file_format}')
+
+
+def normalize_entry(entry, created_at=None):
+    """A clip dict with validated, normalized times; raises ValueError for a bad entry"""
+    if isinstance(entry, Exception):
+        raise entry
+    if not isinstance(entry, dict):
+        raise ValueError('項目不是物件')
+
+    start = parse_time(pick(entry, START_KEYS))
+    end = parse_time(pick(entry, END_KEYS))
+    if start is None or end is None:
+        raise ValueError('時間格式錯誤')
+    if end < start:
+        raise ValueError('結束時間早於開始時間')
+
+    try:
+        start_time, end_time = normalize_time(start), normalize_time(end)
+    except OverflowError:
+        raise ValueError('時間超出範圍')
+
+    name = pick(entry, NAME_KEYS)
+    clip = {
+        'start_time': start_time,
+        'end_time': end_time,
+        'custom_name': str(name) if name is not None else start_time,
+        'path': pick(entry, PATH_KEYS),
+        'created_at': entry.get('created_at') or created_at
+    }
+    if entry.get('source_id') and not clip['path']:
+        clip['source_id'] = entry['source_id']
+    return clip
+
+
+def read_clips(stream, file_format, default_path=None, fps=30.0, max_errors=100):
+    """Parse and normalize every clip of a binary stream in one pass.
+
+    Returns (clips, skipped, errors); at most `max_errors` messages are kept.
+    """
+    if not hasattr(stream, 'read1'):
+        stream = io.BufferedReader(stream, CHUNK_SIZE)
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    entries = iter_entries(text, file_format, fps)
+    created_at = datetime.datetime.now().isoformat()
+
+    clips = []
+    skipped = 0
+    errors = []
+    for number, entry in enumerate(entries, 1):
+        try:
+            clips.append(normalize_entry(entry, created_at))
+        except ValueError as e:
+            skipped += 1
+            if len(errors) < max_errors:
+                errors.append(f'#{number}: {e}')
+
+    # Auto-saves list the source table after the clips
+    sources = getattr(entries, 'sources', None) or {}
+    for clip in clips:
+        if not clip['path']:
+            clip['path'] = sources.get(clip.pop('source_id', None)) or default_path
+    return clips, skipped, errors
@@ -0,0 +1,267 @@
+import bisect
+import math
+
+
+# Entries per chunk of SourceIntervals; a chunk is split in two past twice this
+CHUNK_SIZE = 256
+
+
+def parse_time(value):
+    """Parse HH:MM:SS(.mmm), MM:SS or plain seconds into seconds; None if invalid.
+
+    Infinity and NaN are invalid too, so they never reach arithmetic on clip bounds.
+    """
+    try:
+        if isinstance(value, (int, float)):
+            seconds = float(value)
+        else:
+            parts = [float(part) for part in str(value).strip().split(':')]
+            if not parts or len(parts) > 3 or any(part < 0 for part in parts):
+                return None
+            seconds = 0.0
+            for part in parts:
+                seconds = seconds * 60 + part
+    except (ValueError, OverflowError):
+        return None
+    return seconds if math.isfinite(seconds) else None
+
+
+class SourceIntervals:
+    """Clip intervals of one source file, sorted by start time in chunks.
+
+    A segment tree over the chunks holds each chunk's latest end, so an overlap
+    query bisects to the chunks starting before the query end and only descends
+    into those ending after the query start. A long clip keeps just its own
+    chunk in the scan, and stops doing so once it is removed.
+    """
+
+    def __init__(self):
+        self.chunks = []  # lists of (start, end, clip_id), sorted by start
+        self.chunk_starts = []  # start times of each chunk, parallel to its entries
+        self.firsts = []  # first start of each chunk
+        self.capacity = 0
+        self.tree = []  # max end per chunk at capacity + index, parents above
+        self.count = 0
+
+    def _rebuild_tree(self):
+        capacity = 1
+        while capacity < len(self.chunks):
+            capacity *= 2
+        tree = [-math.inf] * (2 * capacity)
+        for index, chunk in enumerate(self.chunks):
+            tree[capacity + index] = max(entry[1] for entry in chunk)
+        for node in range(capacity - 1, 0, -1):
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+        self.capacity = capacity
+        self.tree = tree
+
+    def _refresh(self, index):
+        """Recompute a chunk's max end after a removal, and its parents"""
+        tree = self.tree
+        node = self.capacity + index
+        tree[node] = max(entry[1] for entry in self.chunks[index])
+        node //= 2
+        while node:
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+            node //= 2
+
+    def _set_chunks(self, entries):
+        self.chunks = [entries[i:i + CHUNK_SIZE] for i in range(0, len(entries), CHUNK_SIZE)]
+        self.chunk_starts = [[entry[0] for entry in chunk] for chunk in self.chunks]
+        self.firsts = [starts[0] for starts in self.chunk_starts]
+        self.count = len(entries)
+        self._rebuild_tree()
+
+    def add(self, start, end, clip_id):
+        if not self.chunks:
+            self._set_chunks([(start, end, clip_id)])
+            return
+        index = max(bisect.bisect_right(self.firsts, start) - 1, 0)
+        starts = self.chunk_starts[index]
+        position = bisect.bisect_right(starts, start)
+        starts.insert(position, start)
+        self.chunks[index].insert(position, (start, end, clip_id))
+        self.firsts[index] = starts[0]
+        self.count += 1
+        if len(starts) > 2 * CHUNK_SIZE:
+            half = len(starts) // 2
+            chunk = self.chunks[index]
+            self.chunks[index:index + 1] = [chunk[:half], chunk[half:]]
+            self.chunk_starts[index:index + 1] = [starts[:half], starts[half:]]
+            self.firsts[index:index + 1] = [starts[0], starts[half]]
+            self._rebuild_tree()
+            return
+        node = self.capacity + index
+        while node and self.tree[node] < end:
+            self.tree[node] = end
+            node //= 2
+
+    def extend(self, entries):
+        """Add many (start, end, clip_id) entries with one sort instead of an insert each"""
+        if not entries:
+            return
+        merged = list(self) + list(entries)
+        merged.sort(key=lambda entry: entry[0])
+        self._set_chunks(merged)
+
+    def remove(self, start, clip_id):
+        # Equal starts may continue into the following chunks
+        index = max(bisect.bisect_left(self.firsts, start) - 1, 0)
+        while index < len(self.chunks) and self.firsts[index] <= start:
+            starts = self.chunk_starts[index]
+            position = bisect.bisect_left(starts, start)
+            while position < len(starts) and starts[position] == start:
+                if self.chunks[index][position][2] == clip_id:
+                    del starts[position]
+                    del self.chunks[index][position]
+                    self.count -= 1
+                    if starts:
+                        self.firsts[index] = starts[0]
+                        self._refresh(index)
+                    else:
+                        del self.chunks[index]
+                        del self.chunk_starts[index]
+                        del self.firsts[index]
+                        self._rebuild_tree()
+                    return True
+                position += 1
+            index += 1
+        return False
+
+    def _chunks_ending_after(self, start, high):
+        """Indexes of the chunks below `high` whose latest end is after `start`, in order"""
+        found = []
+        stack = [(1, 0, self.capacity)]
+        while stack:
+            node, low, limit = stack.pop()
+            if low >= high or self.tree[node] <= start:
+                continue
+            if node >= self.capacity:
+                found.append(low)
+                continue
+            middle = (low + limit) // 2
+            stack.append((2 * node + 1, middle, limit))
+            stack.append((2 * node, low, middle))
+        return found
+
+    def overlapping(self, start, end):
+        """Entries with entry.start < end and entry.end > start"""
+        if not self.chunks:
+            return []
+        high = bisect.bisect_left(self.firsts, end)
+        result = []
+        for index in self._chunks_ending_after(start, high):
+            stop = bisect.bisect_left(self.chunk_starts[index], end)
+            result.extend(entry for entry in self.chunks[index][:stop] if entry[1] > start)
+        return result
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield from chunk
+
+    def __len__(self):
+        return self.count
+
+
+class ClipIntervalIndex:
+    """Per-source interval index over clip bounds, keyed by clip id"""
+
+    def __init__(self):
+        self.sources = {}
+        self.bounds = {}  # clip_id -> (source, start, end)
+
+    def add(self, clip):
+        """Index a clip; clips without valid times are left out"""
+        start = parse_time(clip.get('start_time'))
+        end = parse_time(clip.get('end_time'))
+        if start is None or end is None or end < start:
+            return False
+        source = clip.get('path') or ''
+        self.sources.setdefault(source, SourceIntervals()).add(start, end, clip['id'])
+        self.bounds[clip['id']] = (source, start, end)
+        return True
+
+    def add_many(self, clips):
+        """Index a batch of clips, e.g. an import; returns how many were indexed"""
+        batches = {}
+        for clip in clips:
+            start = parse_time(clip.get('start_time'))
+            end = parse_time(clip.get('end_time'))
+            if start is None or end is None or end < start:
+                continue
+            source = clip.get('path') or ''
+            batches.setdefault(source, []).append((start, end, clip['id']))
+            self.bounds[clip['id']] = (source, start, end)
+        for source, entries in batches.items():
+            self.sources.setdefault(source, SourceIntervals()).extend(entries)
+        return sum(len(entries) for entries in batches.values())
+
+    def remove(self, clip_id):
+        bounds = self.bounds.pop(clip_id, None)
+        if bounds is None:
+            return False
+        source, start, _ = bounds
+        intervals = self.sources[source]
+        intervals.remove(start, clip_id)
+        if not intervals:
+            del self.sources[source]
+        return True
+
+    def update(self, clip):
+        self.remove(clip['id'])
+        return self.add(clip)
+
+    def rebuild(self, clips):
+        self.sources = {}
+        self.bounds = {}
+        self.add_many(clips)
+
+    def query(self, start, end, source=None):
+        """Clip ids overlapping [start, end), in one source or all of them"""
+        if source is not None:
+            sources = [self.sources[source]] if source in self.sources else []
+        else:
+            sources = self.sources.values()
+        return [entry[2] for intervals in sources
+                for entry in intervals.overlapping(start, end)]
+
+    def overlaps_for(self, clip):
+        """Ids of other clips in the same source that overlap this clip"""
+        start = parse_time(clip.get('start_time'))
+        end = parse_time(clip.get('end_time'))
+        if start is None or end is None:
+            return []
+        return [clip_id for clip_id in self.query(start, end, clip.get('path') or '')
+                if clip_id != clip.get('id')]
+
+    def overlapping_pairs(self):
+        """All pairs of overlapping clips, per source, in one sweep"""
+        pairs = []
+        for source, intervals in self.sources.items():
+            active = []
+            for start, end, clip_id in intervals:
+                active = [entry for entry in active if entry[1] > start]
+                pairs.extend((source, entry[2], clip_id) for entry in active)
+                active.append((start, end, clip_id))
+        return pairs
+
+    def merge_groups(self, max_gap=0.0, source=None):
+        """Groups of clip ids whose intervals overlap or are at most max_gap apart"""
+        groups = []
+        if source is None:
+            sources = self.sources.values()
+        else:
+            sources = [self.sources[source]] if source in self.sources else []
+        for intervals in sources:
+            group, group_end = [], None
+            for start, end, clip_id in intervals:
+                if group and start - group_end <= max_gap:
+                    group.append(clip_id)
+                    group_end = max(group_end, end)
+                else:
+                    if len(group) > 1:
+                        groups.append(group)
+                    group, group_end = [clip_id], end
+            if len(group) > 1:
+                groups.append(group)
+        return groups
@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+
+# 大檔案以大區塊循序讀取，避免逐行或小區塊讀取拖慢速度
+CHUNK_SIZE = 8 * 1024 * 1024
+# 快速比對時讀取的檔頭與檔尾大小
+EDGE_SIZE = 1024 * 1024
+
+
+def hash_file(file_path, chunk_size=CHUNK_SIZE):
+    """以固定緩衝區分塊計算檔案雜湊"""
+    digest = hashlib.blake2b(digest_size=32)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+
+def quick_signature(file_path, edge_size=EDGE_SIZE):
+    """以檔案大小加上檔頭/檔尾雜湊做快速比對"""
+    size = os.path.getsize(file_path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(edge_size))
+        if size > edge_size:
+            f.seek(max(size - edge_size, edge_size))
+            digest.update(f.read(edge_size))
+    return f"{size}:{digest.hexdigest()}"
+
+
+def wait_until_stable(file_path, interval=0.5, timeout=None):
+    """等待檔案大小不再變動（錄影仍在寫入時會持續增長）"""
+    started = time.time()
+    last_size = -1
+    while True:
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            return False
+        if size == last_size:
+            return True
+        if timeout is not None and time.time() - started > timeout:
+            return True
+        last_size = size
+        time.sleep(interval)
+
+
+class HashIndex:
+    """持久化的檔案雜湊索引，用來偵測重複檔案"""
+
+    def __init__(self, index_file, quick_check=True):
+        self.index_file = index_file
+        self.quick_check = quick_check
+        self.entries = {}
+        self.by_signature = {}
+        self.lock = threading.Lock()
+        # Tk 執行緒與雜湊執行緒都會存檔，一次只讓一個寫入暫存檔
+        self.save_lock = threading.Lock()
+        self.load()
+
+    def make_record(self, file_path, full_hash=False):
+        """建立檔案紀錄；只有需要時才計算完整雜湊"""
+        stat = os.stat(file_path)
+        record = {
+            "path": file_path,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "quick": quick_signature(file_path),
+            "digest": None
+        }
+        if full_hash or not self.quick_check:
+            record["digest"] = hash_file(file_path)
+        return record
+
+    def is_current(self, record):
+        """檢查紀錄是否仍與磁碟上的檔案一致"""
+        try:
+            stat = os.stat(record["path"])
+        except OSError:
+            return False
+        return stat.st_size == record["size"] and stat.st_mtime == record["mtime"]
+
+    def find_duplicate(self, file_path):
+        """計算新檔案的紀錄，並回傳 (紀錄, 重複的既有紀錄或 None)"""
+        record = self.make_record(file_path)
+        with self.lock:
+            candidates = [self.entries[p] for p in self.by_signature.get(record["quick"], ())
+                          if p != file_path]
+
+        if not candidates:
+            return record, None
+
+        if record["digest"] is None:
+            record["digest"] = hash_file(file_path)
+
+        for candidate in candidates:
+            if not self.is_current(candidate):
+                self.remove(candidate["path"])
+                continue
+            if candidate.get("digest") is None:
+                candidate["digest"] = hash_file(candidate["path"])
+            if candidate["digest"] == record["digest"]:
+                return record, candidate
+
+        return record, None
+
+    def add(self, record):
+        """加入或更新檔案紀錄"""
+        with self.lock:
+            self._discard(record["path"])
+            self.entries[record["path"]] = record
+            self.by_signature.setdefault(record["quick"], set()).add(record["path"])
+
+    def rename(self, old_path, new_path):
+        """檔案重命名後更新紀錄的路徑"""
+        with self.lock:
+            record = self._discard(old_path)
+            if record:
+                record["path"] = new_path
+                self.entries[new_path] = record
+                self.by_signature.setdefault(record["quick"], set()).add(new_path)
+
+    def remove(self, file_path):
+        """移除檔案紀錄"""
+        with self.lock:
+            self._discard(file_path)
+
+    def contains_current(self, file_path):
+        """檢查檔案是否已有最新的紀錄"""
+        with self.lock:
+            record = self.entries.get(file_path)
+        return record is not None and self.is_current(record)
+
+    def _discard(self, file_path):
+        record = self.entries.pop(file_path, None)
+        if record:
+            paths = self.by_signature.get(record["quick"])
+            if paths:
+                paths.discard(file_path)
+                if not paths:
+                    del self.by_signature[record["quick"]]
+        return record
+
+    def load(self):
+        """載入索引檔"""
+        if not os.path.exists(self.index_file):
+            return
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for record in data.get("files", []):
+            self.entries[record["path"]] = record
+            self.by_signature.setdefault(record["quick"], set()).add(record["path"])
+
+    def save(self):
+        """寫入索引檔（先寫暫存檔再取代，避免寫到一半損毀）"""
+        with self.save_lock:
+            # 在存檔鎖內取快照，較舊的快照不會覆蓋較新的
+            with self.lock:
+                data = {"files": list(self.entries.values())}
+            temp_file = self.index_file + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_file, self.index_file)
@@ -1,23 +1,124 @@
 import os
+import re
 import sys
 import time
+import fnmatch
+import queue
 import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog, ttk
 from tkinter.scrolledtext import ScrolledText
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 import json
 from pathlib import Path
 
+from fileindex import HashIndex, wait_until_stable
+
+
+# 預設排除暫存檔與尚未寫完的檔案
+DEFAULT_EXCLUDE_PATTERNS = ["*.tmp", "*.part", "*.crdownload", "~*", ".*"]
+DEFAULT_NAME_FORMAT = "{counter}_{name}"
+DUPLICATE_ACTIONS = {"flag": "標記", "skip": "自動跳過"}
+
+
+def split_patterns(text):
+    """將逗號分隔的字串轉為樣式列表"""
+    return [p.strip() for p in text.split(',') if p.strip()]
+
+
+class WatchRoot:
+    """單一監聽資料夾的設定與狀態"""
+
+    def __init__(self, path, recursive=False, include=None, exclude=None,
+                 name_format=DEFAULT_NAME_FORMAT, file_counter=0):
+        self.path = path
+        self.recursive = recursive
+        self.include = list(include or [])
+        self.exclude = list(
+            DEFAULT_EXCLUDE_PATTERNS if exclude is None else exclude)
+        self.name_format = name_format or DEFAULT_NAME_FORMAT
+        self.file_counter = file_counter
+
+    def matches(self, file_path):
+        """檢查檔案是否符合包含/排除規則"""
+        name = os.path.basename(file_path).lower()
+        if self.include and not any(
+                fnmatch.fnmatch(name, p.lower()) for p in self.include):
+            return False
+        return not any(fnmatch.fnmatch(name, p.lower()) for p in self.exclude)
+
+    def format_name(self, name, ext="", counter=None):
+        """依命名規則組出檔案名稱"""
+        if counter is None:
+            counter = self.file_counter
+        return self.name_format.format(counter=counter, name=name) + ext
+
+    def counter_pattern(self):
+        """由命名規則產生用來解析序號的正規表示式"""
+        parts = []
+        for token in re.split(r"(\{counter(?::[^}]*)?\}|\{name\})", self.name_format):
+            if token.startswith("{counter"):
+                parts.append(r"(?P<counter>\d+)")
+            elif token == "{name}":
+                parts.append(r".*")
+            else:
+                parts.append(re.escape(token))
+        return re.compile(r"^" + "".join(parts))
+
+    def iter_files(self):
+        """列出監聽範圍內的檔案（相對路徑）"""
+        if self.recursive:
+            for dirpath, _, filenames in os.walk(self.path):
+                for filename in filenames:
+                    yield os.path.relpath(os.path.join(dirpath, filename), self.path)
+        else:
+            for filename in os.listdir(self.path):
+                if os.path.isfile(os.path.join(self.path, filename)):
+                    yield filename
+
+    def scan_counter(self):
+        """基於現有檔案的最大序號更新計數器"""
+        regex = self.counter_pattern()
+        max_counter = -1
+        for rel_path in self.iter_files():
+            match = regex.match(os.path.basename(rel_path))
+            if match and match.groupdict().get("counter"):
+                max_counter = max(max_counter, int(match.group("counter")))
+        self.file_counter = max_counter + 1
+        return self.file_counter
+
+    def to_dict(self):
+        return {
+            "path": self.path,
+            "recursive": self.recursive,
+            "include": self.include,
+            "exclude": self.exclude,
+            "name_format": self.name_format,
+            "file_counter": self.file_counter
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["path"],
+            recursive=data.get("recursive", False),
+            include=data.get("include"),
+            exclude=data.get("exclude"),
+            name_format=data.get("name_format", DEFAULT_NAME_FORMAT),
+            file_counter=data.get("file_counter", 0)
+        )
+
 
 class FileListWindow:
     """顯示檔案列表的小視窗"""
 
-    def __init__(self, parent):
+    def __init__(self, parent, watch_root):
         self.parent = parent
+        self.watch_root = watch_root
         self.window = tk.Toplevel(parent.root)
-        self.window.title("檔案列表")
+        self.window.title(f"檔案列表 - {watch_root.path}")
         self.window.geometry("400x300")
         self.window.protocol("WM_DELETE_WINDOW", self.on_closing)
 
@@ -50,23 +151,23 @@ class FileListWindow:
     def refresh_list(self):
         """刷新檔案列表"""
         self.listbox.delete(0, tk.END)
-        if hasattr(self.parent, 'watch_folder') and self.parent.watch_folder:
-            try:
-                files = []
-                for file in os.listdir(self.parent.watch_folder):
-                    file_path = os.path.join(self.parent.watch_folder, file)
-                    if os.path.isfile(file_path):
-                        files.append(file)
+        try:
+            regex = self.watch_root.counter_pattern()
 
-                # 按序號排序
-                files.sort(key=lambda x: int(x.split('_')[0]) if '_' in x and x.split(
-                    '_')[0].isdigit() else 999999)
+            def sort_key(rel_path):
+                match = regex.match(os.path.basename(rel_path))
+                if match and match.groupdict().get("counter"):
+                    return int(match.group("counter"))
+                return 999999
 
-                for file in files:
-                    self.listbox.insert(tk.END, file)
+            # 按序號排序
+            files = sorted(self.watch_root.iter_files(), key=sort_key)
 
-            except Exception as e:
-                self.listbox.insert(tk.END, f"錯誤: {str(e)}")
+            for file in files:
+                self.listbox.insert(tk.END, file)
+
+        except Exception as e:
+            self.listbox.insert(tk.END, f"錯誤: {str(e)}")
 
     def delete_selected(self):
         """刪除選中的檔案"""
@@ -78,7 +179,7 @@ class FileListWindow:
         filename = self.listbox.get(selection[0])
         if messagebox.askyesno("確認刪除", f"確定要刪除檔案 '{filename}' 嗎？"):
             try:
-                file_path = os.path.join(self.parent.watch_folder, filename)
+                file_path = os.path.join(self.watch_root.path, filename)
                 os.remove(file_path)
                 self.refresh_list()
                 messagebox.showinfo("成功", "檔案已刪除")
@@ -91,28 +192,157 @@ class FileListWindow:
 
 
 class FileHandler(FileSystemEventHandler):
-    """檔案系統事件處理器"""
+    """檔案系統事件處理器，每個監聽資料夾各有一個處理執行緒"""
 
-    def __init__(self, app):
+    def __init__(self, app, watch_root):
         self.app = app
+        self.watch_root = watch_root
         self.last_event_time = {}
         self.cooldown = 1.0
+        self.settle_delay = 0.5
+        self.ignored_paths = set()
+        self.queue = queue.Queue()
+        self.worker = threading.Thread(target=self.process_loop, daemon=True)
+        self.worker.start()
 
     def on_created(self, event):
         """當新檔案被創建時觸發"""
         if not event.is_directory:
-            # 稍等一下確保檔案完全寫入
-            now = time.time()
-            last_time = self.last_event_time.get(event.src_path, 0)
+            self.enqueue(event.src_path)
 
-            if now - last_time < self.cooldown:
-                return  # 忽略過短間隔的事件
+    def on_moved(self, event):
+        """暫存檔寫完後改為正式檔名時觸發"""
+        if not event.is_directory:
+            self.enqueue(event.dest_path)
+
+    def ignore(self, file_path):
+        """忽略由本程式自己產生的事件（例如重命名）"""
+        self.ignored_paths.add(file_path)
+
+    def enqueue(self, file_path):
+        """過濾事件並排入處理佇列"""
+        if file_path in self.ignored_paths:
+            self.ignored_paths.discard(file_path)
+            return
+        if not self.watch_root.matches(file_path):
+            return
 
-            # Use dict to store the last event time
-            self.last_event_time[event.src_path] = now
+        now = time.time()
+        last_time = self.last_event_time.get(file_path, 0)
+
+        if now - last_time < self.cooldown:
+            return  # 忽略過短間隔的事件
+
+        # Use dict to store the last event time
+        self.last_event_time[file_path] = now
+        self.queue.put(file_path)
+
+    def process_loop(self):
+        """處理執行緒：等待檔案寫入完成後交給主程式"""
+        while True:
+            file_path = self.queue.get()
+            if file_path is None:
+                break
+
+            # 等到檔案大小不再變動，確保檔案完全寫入
+            if wait_until_stable(file_path, self.settle_delay):
+                self.app.ingest_file(self.watch_root, file_path)
+
+    def stop(self):
+        """停止處理執行緒"""
+        self.queue.put(None)
+        self.worker.join(timeout=2)
+
+
+class WatchRootDialog:
+    """新增或編輯監聽資料夾的對話框"""
+
+    def __init__(self, parent, watch_root=None):
+        self.result = None
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title("監聽資料夾設定")
+        self.dialog.transient(parent)
+        self.dialog.grab_set()
+
+        frame = ttk.Frame(self.dialog)
+        frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+
+        self.path_var = tk.StringVar(value=watch_root.path if watch_root else "")
+        self.recursive_var = tk.BooleanVar(
+            value=watch_root.recursive if watch_root else False)
+        self.include_var = tk.StringVar(
+            value=", ".join(watch_root.include) if watch_root else "")
+        self.exclude_var = tk.StringVar(value=", ".join(
+            watch_root.exclude if watch_root else DEFAULT_EXCLUDE_PATTERNS))
+        self.name_format_var = tk.StringVar(
+            value=watch_root.name_format if watch_root else DEFAULT_NAME_FORMAT)
+        self.file_counter = watch_root.file_counter if watch_root else None
+
+        ttk.Label(frame, text="資料夾:").grid(row=0, column=0, sticky=tk.W)
+        ttk.Entry(frame, textvariable=self.path_var, width=40).grid(
+            row=0, column=1, sticky=tk.EW, pady=2)
+        ttk.Button(frame, text="瀏覽", command=self.browse).grid(
+            row=0, column=2, padx=(5, 0))
+
+        ttk.Checkbutton(frame, text="包含子資料夾", variable=self.recursive_var).grid(
+            row=1, column=1, sticky=tk.W, pady=2)
+
+        ttk.Label(frame, text="包含 (例: *.mp4, *.mkv):").grid(
+            row=2, column=0, sticky=tk.W)
+        ttk.Entry(frame, textvariable=self.include_var).grid(
+            row=2, column=1, columnspan=2, sticky=tk.EW, pady=2)
+
+        ttk.Label(frame, text="排除:").grid(row=3, column=0, sticky=tk.W)
+        ttk.Entry(frame, textvariable=self.exclude_var).grid(
+            row=3, column=1, columnspan=2, sticky=tk.EW, pady=2)
+
+        ttk.Label(frame, text="命名規則:").grid(row=4, column=0, sticky=tk.W)
+        ttk.Entry(frame, textvariable=self.name_format_var).grid(
+            row=4, column=1, columnspan=2, sticky=tk.EW, pady=2)
+        ttk.Label(frame, text="可用 {counter} 與 {name}", foreground="gray").grid(
+            row=5, column=1, sticky=tk.W)
 
-            time.sleep(0.5)
-            self.app.handle_new_file(event.src_path)
+        btn_frame = ttk.Frame(frame)
+        btn_frame.grid(row=6, column=0, columnspan=3, pady=(10, 0))
+        ttk.Button(btn_frame, text="確定", command=self.on_ok).pack(side=tk.LEFT)
+        ttk.Button(btn_frame, text="取消", command=self.dialog.destroy).pack(
+            side=tk.LEFT, padx=(10, 0))
+
+        frame.columnconfigure(1, weight=1)
+        self.dialog.wait_window()
+
+    def browse(self):
+        """選擇資料夾"""
+        folder = filedialog.askdirectory(title="選擇要監聽的資料夾")
+        if folder:
+            self.path_var.set(folder)
+
+    def on_ok(self):
+        """驗證輸入並建立設定"""
+        path = self.path_var.get().strip()
+        if not path or not os.path.isdir(path):
+            messagebox.showerror("錯誤", "請選擇有效的資料夾", parent=self.dialog)
+            return
+
+        name_format = self.name_format_var.get().strip() or DEFAULT_NAME_FORMAT
+        try:
+            valid = "{name}" in name_format and name_format.format(counter=0, name="x")
+        except (KeyError, IndexError, ValueError):
+            valid = False
+        if not valid:
+            messagebox.showerror("錯誤", "命名規則必須包含 {name}，且只能使用 {counter} 與 {name}",
+                                 parent=self.dialog)
+            return
+
+        self.result = WatchRoot(
+            path,
+            recursive=self.recursive_var.get(),
+            include=split_patterns(self.include_var.get()),
+            exclude=split_patterns(self.exclude_var.get()),
+            name_format=name_format,
+            file_counter=self.file_counter or 0
+        )
+        self.dialog.destroy()
 
 
 class FileMonitorApp:
@@ -121,18 +351,31 @@ class FileMonitorApp:
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("檔案監聽器")
-        self.root.geometry("500x400")
+        self.root.geometry("600x500")
 
-        self.watch_folder = None
+        self.watch_roots = []
         self.observer = None
-        self.file_counter = 0
+        self.handlers = {}
         self.config_file = "file_monitor_config.json"
+        self.index_file = "file_hash_index.json"
+        self.duplicate_action = "flag"
+
+        # 雜湊計算在背景執行緒池進行，不阻塞介面
+        self.hash_pool = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="hash")
+        # 既有檔案的索引另用一個低優先的執行緒，大型資料夾不會拖慢新檔案的比對
+        self.index_pool = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="hash-index")
+        self.indexing_roots = set()
+        self.indexing_lock = threading.Lock()
+        self.hash_index = None
 
         self.setup_ui()
         self.load_config()
+        self.load_hash_index()
 
         # 檔案列表視窗
-        self.file_list_window = None
+        self.file_list_windows = {}
 
     def setup_ui(self):
         """設置使用者介面"""
@@ -148,15 +391,28 @@ class FileMonitorApp:
         folder_frame = ttk.LabelFrame(main_frame, text="監聽資料夾", padding=10)
         folder_frame.pack(fill=tk.X, pady=(0, 10))
 
-        self.folder_label = ttk.Label(
-            folder_frame, text="尚未選擇資料夾", foreground="gray")
-        self.folder_label.pack(anchor=tk.W, pady=(0, 10))
+        self.roots_tree = ttk.Treeview(
+            folder_frame, columns=("path", "recursive", "filters", "counter"),
+            show="headings", height=4)
+        self.roots_tree.heading("path", text="資料夾")
+        self.roots_tree.heading("recursive", text="子資料夾")
+        self.roots_tree.heading("filters", text="包含")
+        self.roots_tree.heading("counter", text="檔案序號")
+        self.roots_tree.column("path", width=260)
+        self.roots_tree.column("recursive", width=60, anchor=tk.CENTER)
+        self.roots_tree.column("filters", width=120)
+        self.roots_tree.column("counter", width=70, anchor=tk.CENTER)
+        self.roots_tree.pack(fill=tk.X, pady=(0, 10))
 
         btn_frame = ttk.Frame(folder_frame)
         btn_frame.pack(fill=tk.X)
 
-        ttk.Button(btn_frame, text="選擇資料夾",
-                   command=self.select_folder).pack(side=tk.LEFT)
+        ttk.Button(btn_frame, text="新增資料夾",
+                   command=self.add_watch_root).pack(side=tk.LEFT)
+        ttk.Button(btn_frame, text="編輯", command=self.edit_watch_root).pack(
+            side=tk.LEFT, padx=(10, 0))
+        ttk.Button(btn_frame, text="移除", command=self.remove_watch_root).pack(
+            side=tk.LEFT, padx=(10, 0))
         self.start_btn = ttk.Button(
             btn_frame, text="開始監聽", command=self.start_monitoring, state=tk.DISABLED)
         self.start_btn.pack(side=tk.LEFT, padx=(10, 0))
@@ -170,17 +426,18 @@ class FileMonitorApp:
 
         self.status_label = ttk.Label(
             status_frame, text="就緒", foreground="green")
-        self.status_label.pack(anchor=tk.W)
-
-        # 檔案計數器
-        counter_frame = ttk.LabelFrame(main_frame, text="檔案計數", padding=10)
-        counter_frame.pack(fill=tk.X, pady=(0, 10))
+        self.status_label.pack(side=tk.LEFT)
 
-        self.counter_label = ttk.Label(counter_frame, text="檔案序號: 0")
-        self.counter_label.pack(anchor=tk.W)
+        ttk.Button(status_frame, text="重設選取資料夾計數器", command=self.reset_counter).pack(
+            side=tk.RIGHT)
 
-        ttk.Button(counter_frame, text="重設計數器", command=self.reset_counter).pack(
-            anchor=tk.W, pady=(5, 0))
+        self.duplicate_var = tk.StringVar(value=DUPLICATE_ACTIONS["flag"])
+        duplicate_box = ttk.Combobox(
+            status_frame, textvariable=self.duplicate_var, state="readonly",
+            values=list(DUPLICATE_ACTIONS.values()), width=8)
+        duplicate_box.pack(side=tk.RIGHT, padx=(0, 10))
+        duplicate_box.bind("<<ComboboxSelected>>", self.on_duplicate_action_changed)
+        ttk.Label(status_frame, text="重複檔案:").pack(side=tk.RIGHT)
 
         # 日誌區域
         log_frame = ttk.LabelFrame(main_frame, text="活動日誌", padding=10)
@@ -203,94 +460,248 @@ class FileMonitorApp:
         # 設置視窗關閉事件
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
-    def select_folder(self):
-        """選擇要監聽的資料夾"""
-        folder = filedialog.askdirectory(title="選擇要監聽的資料夾")
-        if folder:
-            self.watch_folder = folder
-            self.folder_label.config(text=folder, foreground="black")
-            self.start_btn.config(state=tk.NORMAL)
-            self.log(f"已選擇資料夾: {folder}")
-            self.save_config()
-            self.update_file_counter()
+    def refresh_roots_view(self):
+        """更新監聽資料夾列表"""
+        self.roots_tree.delete(*self.roots_tree.get_children())
+        for index, watch_root in enumerate(self.watch_roots):
+            self.roots_tree.insert("", tk.END, iid=str(index), values=(
+                watch_root.path,
+                "是" if watch_root.recursive else "否",
+                ", ".join(watch_root.include) or "全部",
+                watch_root.file_counter
+            ))
+
+        can_start = bool(self.watch_roots) and self.observer is None
+        self.start_btn.config(state=tk.NORMAL if can_start else tk.DISABLED)
+
+    def selected_watch_root(self):
+        """取得目前選取的監聽資料夾"""
+        selection = self.roots_tree.selection()
+        if selection:
+            return self.watch_roots[int(selection[0])]
+        if len(self.watch_roots) == 1:
+            return self.watch_roots[0]
+        return None
+
+    def add_watch_root(self):
+        """新增要監聽的資料夾"""
+        watch_root = WatchRootDialog(self.root).result
+        if not watch_root:
+            return
 
-    def update_file_counter(self):
-        """更新檔案計數器，基於現有檔案的最大序號"""
-        if not self.watch_folder:
+        if any(os.path.abspath(r.path) == os.path.abspath(watch_root.path)
+               for r in self.watch_roots):
+            messagebox.showwarning("警告", "此資料夾已在監聽列表中")
             return
 
-        try:
-            max_counter = -1
-            for file in os.listdir(self.watch_folder):
-                if '_' in file:
-                    try:
-                        counter = int(file.split('_')[0])
-                        max_counter = max(max_counter, counter)
-                    except ValueError:
-                        continue
-
-            self.file_counter = max_counter + 1
-            self.counter_label.config(text=f"檔案序號: {self.file_counter}")
+        self.update_file_counter(watch_root)
+        self.watch_roots.append(watch_root)
+        self.log(f"已新增資料夾: {watch_root.path}")
+        self.save_config()
+        self.refresh_roots_view()
+        self.restart_if_monitoring()
+
+    def edit_watch_root(self):
+        """編輯選取的監聽資料夾"""
+        watch_root = self.selected_watch_root()
+        if not watch_root:
+            messagebox.showwarning("警告", "請選擇要編輯的資料夾")
+            return
 
+        updated = WatchRootDialog(self.root, watch_root).result
+        if not updated:
+            return
+
+        if updated.name_format != watch_root.name_format or updated.path != watch_root.path:
+            self.update_file_counter(updated)
+        self.watch_roots[self.watch_roots.index(watch_root)] = updated
+        self.log(f"已更新資料夾設定: {updated.path}")
+        self.save_config()
+        self.refresh_roots_view()
+        self.restart_if_monitoring()
+
+    def remove_watch_root(self):
+        """移除選取的監聽資料夾"""
+        watch_root = self.selected_watch_root()
+        if not watch_root:
+            messagebox.showwarning("警告", "請選擇要移除的資料夾")
+            return
+
+        self.watch_roots.remove(watch_root)
+        self.log(f"已移除資料夾: {watch_root.path}")
+        self.save_config()
+        self.refresh_roots_view()
+        self.restart_if_monitoring()
+
+    def update_file_counter(self, watch_root):
+        """更新檔案計數器，基於現有檔案的最大序號"""
+        try:
+            watch_root.scan_counter()
         except Exception as e:
             self.log(f"更新計數器時發生錯誤: {str(e)}")
 
     def reset_counter(self):
         """重設檔案計數器"""
-        if messagebox.askyesno("確認重設", "確定要重設檔案計數器為 0 嗎？"):
-            self.file_counter = 0
-            self.counter_label.config(text=f"檔案序號: {self.file_counter}")
-            self.log("檔案計數器已重設為 0")
+        watch_root = self.selected_watch_root()
+        if not watch_root:
+            messagebox.showwarning("警告", "請選擇要重設計數器的資料夾")
+            return
+
+        if messagebox.askyesno("確認重設", f"確定要將 {watch_root.path} 的檔案計數器重設為 0 嗎？"):
+            watch_root.file_counter = 0
+            self.refresh_roots_view()
+            self.save_config()
+            self.log(f"檔案計數器已重設為 0: {watch_root.path}")
+
+    def on_duplicate_action_changed(self, event=None):
+        """切換重複檔案的處理方式"""
+        label = self.duplicate_var.get()
+        self.duplicate_action = next(
+            key for key, value in DUPLICATE_ACTIONS.items() if value == label)
+        self.save_config()
+
+    def restart_if_monitoring(self):
+        """監聽中修改設定時重新啟動監聽"""
+        if self.observer:
+            self.stop_monitoring()
+            self.start_monitoring()
 
     def start_monitoring(self):
         """開始監聽檔案"""
-        if not self.watch_folder:
-            messagebox.showerror("錯誤", "請先選擇要監聽的資料夾")
+        if not self.watch_roots:
+            messagebox.showerror("錯誤", "請先新增要監聽的資料夾")
             return
 
         try:
             self.observer = Observer()
-            event_handler = FileHandler(self)
-            self.observer.schedule(
-                event_handler, self.watch_folder, recursive=False)
+            for watch_root in self.watch_roots:
+                event_handler = FileHandler(self, watch_root)
+                self.handlers[watch_root.path] = event_handler
+                self.observer.schedule(
+                    event_handler, watch_root.path, recursive=watch_root.recursive)
             self.observer.start()
 
+            # 背景建立現有檔案的索引，讓舊檔案也能被比對
+            for watch_root in self.watch_roots:
+                self.schedule_indexing(watch_root)
+
             self.start_btn.config(state=tk.DISABLED)
             self.stop_btn.config(state=tk.NORMAL)
-            self.status_label.config(text="監聽中...", foreground="blue")
-            self.log(f"開始監聽資料夾: {self.watch_folder}")
+            self.status_label.config(
+                text=f"監聽中... ({len(self.watch_roots)} 個資料夾)", foreground="blue")
+            for watch_root in self.watch_roots:
+                self.log(f"開始監聽資料夾: {watch_root.path}")
 
         except Exception as e:
+            self.stop_handlers()
+            self.observer = None
             messagebox.showerror("錯誤", f"啟動監聽失敗: {str(e)}")
             self.log(f"啟動監聽失敗: {str(e)}")
 
+    def stop_handlers(self):
+        """停止所有處理執行緒"""
+        for event_handler in self.handlers.values():
+            event_handler.stop()
+        self.handlers = {}
+
     def stop_monitoring(self):
         """停止監聽檔案"""
         if self.observer:
             self.observer.stop()
             self.observer.join()
             self.observer = None
+        self.stop_handlers()
 
         self.start_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
         self.status_label.config(text="已停止", foreground="red")
         self.log("監聽已停止")
 
-    def handle_new_file(self, file_path):
+    def load_hash_index(self):
+        """載入檔案雜湊索引"""
+        try:
+            self.hash_index = HashIndex(self.index_file)
+        except Exception as e:
+            self.log(f"載入雜湊索引失敗，將重新建立: {str(e)}")
+            if os.path.exists(self.index_file):
+                os.remove(self.index_file)
+            self.hash_index = HashIndex(self.index_file)
+
+    def save_hash_index(self):
+        """保存檔案雜湊索引"""
+        try:
+            self.hash_index.save()
+        except Exception as e:
+            self.root.after(0, self.log, f"保存雜湊索引失敗: {str(e)}")
+
+    def schedule_indexing(self, watch_root):
+        """排入既有檔案的索引；同一資料夾已在排程中時不重複排入"""
+        with self.indexing_lock:
+            if watch_root in self.indexing_roots:
+                return
+            self.indexing_roots.add(watch_root)
+        self.index_pool.submit(self.index_existing_files, watch_root)
+
+    def index_existing_files(self, watch_root):
+        """為監聽資料夾中尚未索引的檔案建立紀錄（於背景執行）"""
+        added = 0
+        try:
+            for rel_path in watch_root.iter_files():
+                # 停止監聽或移除資料夾後就不再繼續
+                if self.observer is None or watch_root not in self.watch_roots:
+                    break
+                file_path = os.path.join(watch_root.path, rel_path)
+                if not watch_root.matches(file_path) or self.hash_index.contains_current(file_path):
+                    continue
+                self.hash_index.add(self.hash_index.make_record(file_path))
+                added += 1
+        except Exception as e:
+            self.root.after(0, self.log, f"建立索引失敗: {str(e)}")
+        finally:
+            with self.indexing_lock:
+                self.indexing_roots.discard(watch_root)
+
+        if added:
+            self.save_hash_index()
+            self.root.after(0, self.log, f"已索引 {added} 個既有檔案: {watch_root.path}")
+
+    def ingest_file(self, watch_root, file_path):
+        """將新檔案交給執行緒池計算雜湊（由各資料夾的處理執行緒呼叫）"""
+        future = self.hash_pool.submit(self.hash_index.find_duplicate, file_path)
+        future.add_done_callback(
+            lambda f: self.on_file_hashed(watch_root, file_path, f))
+
+    def on_file_hashed(self, watch_root, file_path, future):
+        """雜湊完成後決定是否跳過重複檔案"""
+        try:
+            record, duplicate = future.result()
+        except Exception as e:
+            self.root.after(0, self.log, f"計算雜湊失敗: {str(e)}")
+            record, duplicate = None, None
+
+        if duplicate and self.duplicate_action == "skip":
+            self.root.after(0, self.log,
+                            f"跳過重複檔案: {os.path.basename(file_path)} (與 {duplicate['path']} 相同)")
+            return
+
+        self.handle_new_file(watch_root, file_path, record, duplicate)
+
+    def handle_new_file(self, watch_root, file_path, record=None, duplicate=None):
         """處理新檔案"""
         original_name = os.path.basename(file_path)
         file_dir = os.path.dirname(file_path)
 
         # 在主線程中顯示對話框
         self.root.after(0, self.show_rename_dialog,
-                        file_path, original_name, file_dir)
+                        watch_root, file_path, original_name, file_dir, record, duplicate)
 
-    def show_rename_dialog(self, file_path, original_name, file_dir):
+    def show_rename_dialog(self, watch_root, file_path, original_name, file_dir,
+                           record=None, duplicate=None):
         """顯示重命名對話框"""
         # 創建自定義對話框
         dialog = tk.Toplevel(self.root)
         dialog.title("新檔案偵測")
-        dialog.geometry("400x200")
+        dialog.geometry("400x220")
         dialog.transient(self.root)
         dialog.grab_set()
 
@@ -306,8 +717,14 @@ class FileMonitorApp:
 
         # 訊息
         ttk.Label(main_frame, text=f"偵測到新檔案: {original_name}").pack(
-            pady=(0, 10))
-        ttk.Label(main_frame, text=f"將重命名為: {self.file_counter}_<您的輸入>").pack(
+            pady=(0, 5))
+        ttk.Label(main_frame, text=f"資料夾: {file_dir}", foreground="gray").pack(
+            pady=(0, 5))
+        if duplicate:
+            dialog.geometry("400x250")
+            ttk.Label(main_frame, text=f"⚠ 與既有檔案重複: {os.path.basename(duplicate['path'])}",
+                      foreground="red").pack(pady=(0, 5))
+        ttk.Label(main_frame, text=f"將重命名為: {watch_root.format_name('<您的輸入>')}").pack(
             pady=(0, 10))
 
         # 輸入框
@@ -347,13 +764,17 @@ class FileMonitorApp:
 
         # 處理結果
         if result["action"] == "rename":
-            self.rename_file(file_path, original_name, result["name"])
+            self.rename_file(watch_root, file_path,
+                             original_name, result["name"], record)
         elif result["action"] == "delete":
-            self.delete_file(file_path, original_name)
+            self.delete_file(watch_root, file_path, original_name)
         else:  # skip
             self.log(f"跳過檔案: {original_name}")
+            if record:
+                self.hash_index.add(record)
+                self.save_hash_index()
 
-    def rename_file(self, file_path, original_name, new_name):
+    def rename_file(self, watch_root, file_path, original_name, new_name, record=None):
         """重命名檔案"""
         try:
             if not new_name:
@@ -363,58 +784,77 @@ class FileMonitorApp:
             _, ext = os.path.splitext(original_name)
 
             # 構造新檔案名
-            new_filename = f"{self.file_counter}_{new_name}{ext}"
+            new_filename = watch_root.format_name(new_name, ext)
             new_file_path = os.path.join(
                 os.path.dirname(file_path), new_filename)
 
             # 檢查檔案是否已存在
             counter = 1
             while os.path.exists(new_file_path):
-                new_filename = f"{self.file_counter}_{new_name}_{counter}{ext}"
+                new_filename = watch_root.format_name(
+                    f"{new_name}_{counter}", ext)
                 new_file_path = os.path.join(
                     os.path.dirname(file_path), new_filename)
                 counter += 1
 
-            # 重命名檔案
+            # 重命名檔案（避免觸發自己的移動事件）
+            event_handler = self.handlers.get(watch_root.path)
+            if event_handler:
+                event_handler.ignore(new_file_path)
             os.rename(file_path, new_file_path)
 
+            if record:
+                record["path"] = new_file_path
+                self.hash_index.add(record)
+            else:
+                self.hash_index.rename(file_path, new_file_path)
+            self.save_hash_index()
+
             self.log(f"檔案已重命名: {original_name} -> {new_filename}")
-            self.file_counter += 1
-            self.counter_label.config(text=f"檔案序號: {self.file_counter}")
+            watch_root.file_counter += 1
+            self.refresh_roots_view()
+            self.save_config()
 
-            # 更新檔案列表視窗
-            if self.file_list_window and self.file_list_window.window.winfo_exists():
-                self.file_list_window.refresh_list()
+            self.refresh_file_list(watch_root)
 
         except Exception as e:
             self.log(f"重命名檔案失敗: {str(e)}")
             messagebox.showerror("錯誤", f"重命名檔案失敗: {str(e)}")
 
-    def delete_file(self, file_path, original_name):
+    def delete_file(self, watch_root, file_path, original_name):
         """刪除檔案"""
         try:
             os.remove(file_path)
             self.log(f"檔案已刪除: {original_name}")
+            self.hash_index.remove(file_path)
+            self.save_hash_index()
 
-            # 更新檔案列表視窗
-            if self.file_list_window and self.file_list_window.window.winfo_exists():
-                self.file_list_window.refresh_list()
+            self.refresh_file_list(watch_root)
 
         except Exception as e:
             self.log(f"刪除檔案失敗: {str(e)}")
             messagebox.showerror("錯誤", f"刪除檔案失敗: {str(e)}")
 
+    def refresh_file_list(self, watch_root):
+        """更新檔案列表視窗"""
+        window = self.file_list_windows.get(watch_root.path)
+        if window and window.window.winfo_exists():
+            window.refresh_list()
+
     def show_file_list(self):
         """顯示檔案列表視窗"""
-        if not self.watch_folder:
-            messagebox.showwarning("警告", "請先選擇要監聽的資料夾")
+        watch_root = self.selected_watch_root()
+        if not watch_root:
+            messagebox.showwarning("警告", "請先選擇要顯示的監聽資料夾")
             return
 
-        if self.file_list_window is None or not self.file_list_window.window.winfo_exists():
-            self.file_list_window = FileListWindow(self)
+        window = self.file_list_windows.get(watch_root.path)
+        if window is None or not window.window.winfo_exists():
+            self.file_list_windows[watch_root.path] = FileListWindow(
+                self, watch_root)
         else:
-            self.file_list_window.window.deiconify()
-            self.file_list_window.refresh_list()
+            window.window.deiconify()
+            window.refresh_list()
 
     def log(self, message):
         """添加日誌訊息"""
@@ -430,8 +870,8 @@ class FileMonitorApp:
     def save_config(self):
         """保存配置"""
         config = {
-            "watch_folder": self.watch_folder,
-            "file_counter": self.file_counter
+            "watch_roots": [r.to_dict() for r in self.watch_roots],
+            "duplicate_action": self.duplicate_action
         }
         try:
             with open(self.config_file, 'w', encoding='utf-8') as f:
@@ -446,14 +886,23 @@ class FileMonitorApp:
                 with open(self.config_file, 'r', encoding='utf-8') as f:
                     config = json.load(f)
 
-                if config.get("watch_folder") and os.path.exists(config["watch_folder"]):
-                    self.watch_folder = config["watch_folder"]
-                    self.folder_label.config(
-                        text=self.watch_folder, foreground="black")
-                    self.start_btn.config(state=tk.NORMAL)
+                roots = config.get("watch_roots")
+                if roots is None and config.get("watch_folder"):
+                    # 舊版單一資料夾設定
+                    roots = [{
+                        "path": config["watch_folder"],
+                        "file_counter": config.get("file_counter", 0)
+                    }]
+
+                for data in roots or []:
+                    if os.path.exists(data.get("path", "")):
+                        self.watch_roots.append(WatchRoot.from_dict(data))
+
+                self.duplicate_action = config.get("duplicate_action", "flag")
+                self.duplicate_var.set(
+                    DUPLICATE_ACTIONS.get(self.duplicate_action, DUPLICATE_ACTIONS["flag"]))
 
-                self.file_counter = config.get("file_counter", 0)
-                self.counter_label.config(text=f"檔案序號: {self.file_counter}")
+                self.refresh_roots_view()
 
         except Exception as e:
             self.log(f"載入配置失敗: {str(e)}")
@@ -464,6 +913,9 @@ class FileMonitorApp:
         if self.observer:
             self.observer.stop()
             self.observer.join()
+        self.stop_handlers()
+        self.hash_pool.shutdown(wait=False)
+        self.index_pool.shutdown(wait=False, cancel_futures=True)
         self.root.quit()
 
     def run(self):
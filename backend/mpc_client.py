@@ -0,0 +1,254 @@
+import asyncio
+import threading
+import time
+
+from metrics import FAST_BUCKETS, registry as metrics_registry
+
+
+# One event loop thread serves every MpcClient, however many players are registered
+_shared_loop = None
+_shared_loop_lock = threading.Lock()
+
+
+def get_shared_loop():
+    """Start the shared event loop thread on first use"""
+    global _shared_loop
+    with _shared_loop_lock:
+        if _shared_loop is None:
+            _shared_loop = asyncio.new_event_loop()
+            threading.Thread(target=_shared_loop.run_forever,
+                             name='mpc-client', daemon=True).start()
+    return _shared_loop
+
+
+MPC_REQUESTS = metrics_registry.counter(
+    'mpc_requests_total', 'MPC-HC page requests by outcome', ('page', 'outcome'))
+MPC_FETCH_SECONDS = metrics_registry.histogram(
+    'mpc_fetch_seconds', 'Round trip of MPC-HC page fetches that got an answer', ('page',))
+MPC_PARSE_SECONDS = metrics_registry.histogram(
+    'mpc_parse_seconds', 'Time spent parsing MPC-HC pages', ('page',), buckets=FAST_BUCKETS)
+
+
+class MpcError(Exception):
+    """MPC-HC request failed"""
+    def __init__(self, message, last_known=None):
+        super().__init__(message)
+        self.last_known = last_known
+
+
+class MpcUnavailableError(MpcError):
+    """MPC-HC could not be reached, or the circuit breaker is open"""
+
+
+class MpcResponseError(MpcError):
+    """MPC-HC answered, but not with a usable page"""
+
+
+def parse_mpc_info(content):
+    """Parse file name and position out of MPC-HC's info.html"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, 'html.parser')
+    element = soup.find(id='mpchc_np')
+    if element is None:
+        return None
+    parts = element.get_text().strip('«»').split('•')
+    if len(parts) < 3:
+        return None
+    return {
+        'file_name': parts[1].strip(),
+        'current_position': parts[2].split('/')[0].strip()
+    }
+
+
+def parse_mpc_variables(content):
+    """Parse file path, play state, position and playback rate out of MPC-HC's variables.html"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content.decode('latin1'), 'html.parser')
+    file_path_element = soup.find(id='filepath')
+    if file_path_element is None:
+        return None
+
+    def number(element_id, convert, default=None):
+        element = soup.find(id=element_id)
+        try:
+            return convert(element.text.strip())
+        except (AttributeError, ValueError):
+            return default
+
+    def convert_encoding(text):
+        # MPC-HC sends UTF-8 that was read as latin1; leave text alone that is not valid UTF-8
+        try:
+            return text.encode('latin1').decode('utf-8')
+        except UnicodeError:
+            return text
+
+    file_path = convert_encoding(file_path_element.text)
+    file_name_element = soup.find(id='file')
+    if file_name_element is not None:
+        file_name = convert_encoding(file_name_element.text)
+    else:
+        file_name = file_path.replace('\\', '/').rsplit('/', 1)[-1]
+    return {
+        'file_path': file_path,
+        'file_name': file_name,
+        'state': number('state', int),
+        'position_ms': number('position', int),
+        'duration_ms': number('duration', int),
+        'playback_rate': number('playbackrate', float, 1.0)
+    }
+
+
+class MpcClient:
+    """Async MPC-HC web interface client with per-call deadlines and a circuit breaker.
+
+    Requests run on a shared asyncio loop in a background thread, so a hung
+    player only ever costs a request thread `deadline` seconds. After
+    `failure_threshold` consecutive connection failures the circuit opens:
+    calls fail immediately with the last known state while a background probe
+    polls the player every `probe_interval` seconds and closes the circuit once
+    it answers again.
+    """
+
+    def __init__(self, base_url, deadline=1.5, failure_threshold=3, probe_interval=2.0):
+        self.base_url = base_url.rstrip('/')
+        self.deadline = deadline
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+
+        self.consecutive_failures = 0
+        self.circuit_open = False
+        self.opened_at = None
+        self.last_error = None
+        self.last_success_at = None
+        self.last_known = {}
+
+        self._loop = None
+        self._session = None
+        self._probe_task = None
+
+    def _ensure_loop(self):
+        if self._loop is None:
+            self._loop = get_shared_loop()
+        return self._loop
+
+    async def _get_session(self):
+        if self._session is None:
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.deadline))
+        return self._session
+
+    async def _fetch(self, page):
+        """GET a page, bounded by the deadline"""
+        session = await self._get_session()
+        async with session.get(f"{self.base_url}/{page}") as response:
+            return response.status, await response.read()
+
+    def _record_failure(self, error):
+        self.last_error = str(error) or type(error).__name__
+        self.consecutive_failures += 1
+        if not self.circuit_open and self.consecutive_failures >= self.failure_threshold:
+            self.circuit_open = True
+            self.opened_at = time.time()
+            print(f"MPC-HC unreachable, circuit opened: {error}")
+            self._probe_task = self._loop.create_task(self._probe())
+
+    def _record_success(self):
+        self.consecutive_failures = 0
+        self.last_success_at = time.time()
+        if self.circuit_open:
+            print("MPC-HC reachable again, circuit closed")
+        self.circuit_open = False
+        self.opened_at = None
+
+    async def _probe(self):
+        """Poll the player until it answers again"""
+        while self.circuit_open:
+            await asyncio.sleep(self.probe_interval)
+            try:
+                await asyncio.wait_for(self._fetch('info.html'), self.deadline)
+            except Exception as e:
+                self.last_error = str(e) or type(e).__name__
+                continue
+            self._record_success()
+
+    def get(self, page, parse):
+        """Fetch `page` and return `parse(body)`, remembering it as the last known state"""
+        if self.circuit_open:
+            MPC_REQUESTS.inc(page, 'circuit_open')
+            raise MpcUnavailableError(f'MPC-HC 無回應: {self.last_error}',
+                                      self.last_known.get(page))
+
+        loop = self._ensure_loop()
+        requested_at = time.time()
+        started = time.perf_counter()
+        future = asyncio.run_coroutine_threadsafe(
+            asyncio.wait_for(self._fetch(page), self.deadline), loop)
+        try:
+            # A small margin so the loop-side timeout fires first
+            status, body = future.result(self.deadline + 0.5)
+            fetched_at = time.time()
+        except Exception as e:
+            # Timeouts, refused connections and client errors all count as unreachable
+            future.cancel()
+            loop.call_soon_threadsafe(self._record_failure, e)
+            MPC_REQUESTS.inc(page, 'unreachable')
+            raise MpcUnavailableError(f'無法連接到 MPC-HC: {str(e) or type(e).__name__}',
+                                      self.last_known.get(page))
+
+        MPC_FETCH_SECONDS.observe(time.perf_counter() - started, page)
+        loop.call_soon_threadsafe(self._record_success)
+        if status != 200:
+            MPC_REQUESTS.inc(page, 'http_error')
+            raise MpcResponseError(f'MPC-HC 回應錯誤: HTTP {status}', self.last_known.get(page))
+
+        parse_started = time.perf_counter()
+        try:
+            data = parse(body)
+        except Exception as e:
+            # Malformed pages (bad encodings, broken markup) get the same contract as unparsable ones
+            print(f"Error parsing MPC-HC {page}: {e}")
+            data = None
+        MPC_PARSE_SECONDS.observe(time.perf_counter() - parse_started, page)
+        if data is None:
+            MPC_REQUESTS.inc(page, 'parse_error')
+            raise MpcResponseError('無法解析 MPC-HC 回應', self.last_known.get(page))
+
+        # The player produced the page somewhere inside this window
+        data['requested_at'] = requested_at
+        data['fetched_at'] = fetched_at
+        self.last_known[page] = data
+        MPC_REQUESTS.inc(page, 'ok')
+        return data
+
+    def close(self, timeout=1.0):
+        """Stop probing and close the HTTP session"""
+        self.circuit_open = False
+        if self._loop is None or self._session is None:
+            return
+
+        async def close_session():
+            if self._probe_task:
+                self._probe_task.cancel()
+            await self._session.close()
+            self._session = None
+
+        future = asyncio.run_coroutine_threadsafe(close_session(), self._loop)
+        try:
+            future.result(timeout)
+        except Exception as e:
+            print(f"Error closing MPC-HC client: {e}")
+
+    def status(self):
+        """Circuit breaker state for health reporting"""
+        return {
+            'base_url': self.base_url,
+            'reachable': not self.circuit_open and self.consecutive_failures == 0,
+            'circuit_open': self.circuit_open,
+            'consecutive_failures': self.consecutive_failures,
+            'opened_at': self.opened_at,
+            'last_success_at': self.last_success_at,
+            'last_error': self.last_error
+        }
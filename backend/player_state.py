@@ -0,0 +1,267 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from mpc_client import MpcClient, MpcError, MpcResponseError, parse_mpc_info, parse_mpc_variables
+from storage import atomic_write_json
+
+
+# MPC-HC's variables.html state value while playing
+MPC_STATE_PLAYING = 2
+# Mark times further in the past than this are treated as bogus client clocks
+MAX_MARK_AGE = 10.0
+
+
+def format_position(position_ms, precise=False):
+    """Format milliseconds as HH:MM:SS (rounded to the nearest second), or HH:MM:SS.mmm when precise"""
+    if precise:
+        total_seconds, millis = divmod(int(round(position_ms)), 1000)
+    else:
+        total_seconds, millis = int(round(position_ms / 1000)), 0
+    hours, remainder = divmod(total_seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if precise:
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{millis:03d}"
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+class PlayerStateService:
+    """Shared access to the player state.
+
+    Concurrent callers asking for the same page share one in-flight fetch
+    (single-flight), and a result younger than `freshness` seconds is served
+    from memory without asking the player again.
+    """
+
+    def __init__(self, client, freshness=0.1):
+        self.client = client
+        self.freshness = freshness
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_url(cls, base_url, deadline=1.5, freshness=0.1):
+        return cls(MpcClient(base_url, deadline=deadline), freshness=freshness)
+
+    def fetch(self, page, parse, max_age=None):
+        """Return the parsed page, reusing a fresh or in-flight result when possible"""
+        max_age = self.freshness if max_age is None else max_age
+        with self._lock:
+            cached = self.client.last_known.get(page)
+            if cached and time.time() - cached['fetched_at'] <= max_age:
+                return dict(cached)
+
+            future = self._inflight.get(page)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[page] = future
+
+        if not leader:
+            return dict(future.result())
+
+        try:
+            future.set_result(self.client.get(page, parse))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(page, None)
+        return dict(future.result())
+
+    def info(self, max_age=None):
+        """File name and current position from info.html"""
+        return self.fetch('info.html', parse_mpc_info, max_age)
+
+    def variables(self, max_age=None):
+        """Current file path from variables.html"""
+        return self.fetch('variables.html', parse_mpc_variables, max_age)
+
+    def position_at(self, mark_time, max_age=None):
+        """Estimate the playback position at `mark_time` (epoch seconds), e.g. a keypress.
+
+        MPC-HC sampled its position somewhere between sending the request and
+        receiving the page; the midpoint is taken as the sample time, and while
+        playing the position is moved by (mark_time - sample time) * playback
+        rate. Half the round trip bounds the error of that guess.
+        """
+        variables = self.variables(max_age)
+        if variables.get('position_ms') is None:
+            raise MpcResponseError('無法解析 MPC-HC 播放位置', variables)
+
+        rtt = variables['fetched_at'] - variables['requested_at']
+        sampled_at = variables['requested_at'] + rtt / 2
+        playing = variables.get('state') == MPC_STATE_PLAYING
+        rate = variables.get('playback_rate') or 1.0
+
+        now = time.time()
+        mark_time_used = mark_time is not None and now - MAX_MARK_AGE <= mark_time <= now + 0.05
+        if not mark_time_used:
+            mark_time = sampled_at
+
+        compensation_ms = (mark_time - sampled_at) * rate * 1000 if playing else 0.0
+        position_ms = max(0.0, variables['position_ms'] + compensation_ms)
+        if variables.get('duration_ms'):
+            position_ms = min(position_ms, variables['duration_ms'])
+
+        return {
+            'file_name': variables['file_name'],
+            'file_path': variables['file_path'],
+            'position_ms': round(position_ms),
+            'reported_position_ms': variables['position_ms'],
+            'playing': playing,
+            'playback_rate': rate,
+            'compensation_ms': round(compensation_ms, 1),
+            'error_ms': round(rtt / 2 * rate * 1000, 1) if playing else 0.0,
+            'rtt_ms': round(rtt * 1000, 1),
+            'mark_time': mark_time,
+            'mark_time_used': mark_time_used
+        }
+
+    def file_path(self, max_age=None):
+        return self.variables(max_age)['file_path']
+
+    def status(self):
+        return self.client.status()
+
+    def close(self):
+        self.client.close()
+
+
+class PlayerRegistry:
+    """Registered MPC-HC instances, each with its own state service and circuit breaker.
+
+    With a `registry_file`, players registered with persist=True survive restarts,
+    so sessions restored from auto-saves find the player they were bound to.
+    """
+
+    def __init__(self, deadline=1.5, freshness=0.1, registry_file=None):
+        self.deadline = deadline
+        self.freshness = freshness
+        self.registry_file = registry_file
+        self.players = {}
+        self._lock = threading.Lock()
+        self._poll_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='player-poll')
+        self.load()
+
+    def register(self, player_id, base_url, name=None, persist=True):
+        """Add a player, or update its URL and name"""
+        base_url = base_url.rstrip('/')
+        with self._lock:
+            existing = self.players.get(player_id)
+            if existing and existing['base_url'] == base_url:
+                changed = bool(name) and name != existing['name']
+                existing['name'] = name or existing['name']
+            else:
+                if existing:
+                    existing['service'].close()
+                existing = {
+                    'id': player_id,
+                    'name': name or player_id,
+                    'base_url': base_url,
+                    'persist': persist,
+                    'service': PlayerStateService.for_url(
+                        base_url, deadline=self.deadline, freshness=self.freshness)
+                }
+                self.players[player_id] = existing
+                changed = True
+        if changed and persist:
+            self.save()
+        return existing
+
+    def unregister(self, player_id):
+        with self._lock:
+            entry = self.players.pop(player_id, None)
+        if entry is None:
+            return False
+        entry['service'].close()
+        if entry['persist']:
+            self.save()
+        return True
+
+    def __contains__(self, player_id):
+        with self._lock:
+            return player_id in self.players
+
+    def load(self):
+        if not self.registry_file or not os.path.exists(self.registry_file):
+            return
+        try:
+            with open(self.registry_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading player registry: {e}")
+            return
+        for player in data.get('players', []):
+            with self._lock:
+                self.players[player['id']] = {
+                    'id': player['id'],
+                    'name': player.get('name') or player['id'],
+                    'base_url': player['base_url'],
+                    'persist': True,
+                    'service': PlayerStateService.for_url(
+                        player['base_url'], deadline=self.deadline, freshness=self.freshness)
+                }
+
+    def save(self):
+        """Write the players registered with persist=True"""
+        if not self.registry_file:
+            return
+        with self._lock:
+            data = {'players': [self.describe(entry) for entry in self.players.values()
+                                if entry['persist']]}
+        try:
+            atomic_write_json(self.registry_file, data)
+        except OSError as e:
+            print(f"Error saving player registry: {e}")
+
+    def close(self):
+        """Close every player's client, on shutdown"""
+        with self._lock:
+            entries = list(self.players.values())
+        for entry in entries:
+            entry['service'].close()
+
+    def get(self, player_id):
+        """State service of a player; KeyError if it is not registered"""
+        with self._lock:
+            return self.players[player_id]['service']
+
+    def describe(self, entry):
+        return {
+            'id': entry['id'],
+            'name': entry['name'],
+            'base_url': entry['base_url']
+        }
+
+    def poll(self, entry):
+        """Current state of one player, never raising"""
+        result = self.describe(entry)
+        try:
+            variables = entry['service'].variables()
+            result.update({
+                'reachable': True,
+                'file_path': variables['file_path'],
+                'file_name': variables['file_name'],
+                'state': variables['state'],
+                'position_ms': variables['position_ms'],
+                'duration_ms': variables['duration_ms'],
+                'playback_rate': variables['playback_rate'],
+                'fetched_at': variables['fetched_at']
+            })
+        except MpcError as e:
+            result.update({
+                'reachable': False,
+                'error': str(e),
+                'last_known': e.last_known
+            })
+        result['status'] = entry['service'].status()
+        return result
+
+    def poll_all(self):
+        """Poll every registered player concurrently"""
+        with self._lock:
+            entries = list(self.players.values())
+        return list(self._poll_pool.map(self.poll, entries))
@@ -0,0 +1,280 @@
+import datetime
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from clip_index import parse_time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    file_path TEXT,
+    file_mtime REAL,
+    created_at TEXT,
+    last_modified TEXT,
+    clips_count INTEGER
+);
+CREATE TABLE IF NOT EXISTS clips (
+    rowid INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    clip_id TEXT,
+    position INTEGER,
+    custom_name TEXT,
+    path TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    start_seconds REAL,
+    end_seconds REAL,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS clips_session ON clips (session_id);
+CREATE INDEX IF NOT EXISTS clips_created ON clips (created_at);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE clips_fts USING fts5(
+    custom_name, path, content='clips', content_rowid='rowid', {options}
+);
+"""
+# Best first. trigram (SQLite 3.34+) matches substrings, so words inside CJK names
+# are found; unicode61 only matches word prefixes, and a CJK name is one word to it.
+FTS_TOKENIZERS = (
+    ('trigram', "tokenize='trigram'"),
+    ('unicode61', "prefix='2 3'"),
+)
+CJK = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+
+
+def end_bound(created_to):
+    """Exclusive upper bound for created_at; a date-only value includes that whole day"""
+    try:
+        day = datetime.date.fromisoformat(created_to)
+    except ValueError:
+        return created_to
+    if len(created_to) != 10:
+        return created_to
+    return (day + datetime.timedelta(days=1)).isoformat()
+
+
+def search_terms(query):
+    """Split a query into words for prefix matching"""
+    return [term for term in re.split(r'[\s"*:()^\-+]+', query) if term]
+
+
+class SearchIndex:
+    """Persistent SQLite index over clips of every session and auto-save.
+
+    Clip names and source paths go into an FTS5 table, matched by substring with
+    the trigram tokenizer or by word prefix with unicode61; terms the table
+    cannot match, or every term where SQLite lacks FTS5, use LIKE. Sessions are reindexed as
+    a whole, which is what an auto-save write costs anyway; auto-save files
+    are only re-read when their mtime changed.
+    """
+
+    def __init__(self, db_path):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self.tokenizer = self._create_fts()
+        self.fts = self.tokenizer is not None
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pending_lock = threading.Condition()
+        self._worker = None
+
+    def _create_fts(self):
+        """Set up clips_fts with the best tokenizer SQLite supports; None without FTS5.
+
+        A table made with another tokenizer (e.g. before an SQLite upgrade) is
+        recreated and rebuilt from the clips table.
+        """
+        row = self.db.execute("SELECT sql FROM sqlite_master WHERE name = 'clips_fts'").fetchone()
+        for tokenizer, options in FTS_TOKENIZERS:
+            if row and options in row[0]:
+                return tokenizer
+            try:
+                self.db.execute(f'CREATE VIRTUAL TABLE temp.fts_probe USING fts5(text, {options})')
+                self.db.execute('DROP TABLE temp.fts_probe')
+            except sqlite3.OperationalError:
+                continue
+            with self.db:
+                self.db.execute('DROP TABLE IF EXISTS clips_fts')
+                self.db.execute(FTS_SCHEMA.format(options=options))
+                self.db.execute("INSERT INTO clips_fts (clips_fts) VALUES ('rebuild')")
+            return tokenizer
+        return None
+
+    def fts_term(self, term):
+        """Whether the FTS table can match `term`; other terms fall back to LIKE"""
+        if self.tokenizer == 'trigram':
+            return len(term) >= 3
+        if self.tokenizer == 'unicode61':
+            return not CJK.search(term)
+        return False
+
+    def index_session_async(self, data, file_path=None, file_mtime=None):
+        """Queue a reindex off the request path; repeated saves of a session collapse into one"""
+        with self._pending_lock:
+            self._pending[data.get('session_id')] = (data, file_path, file_mtime)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run_pending, name='search-index',
+                                                daemon=True)
+                self._worker.start()
+            self._pending_lock.notify()
+
+    def _run_pending(self):
+        while True:
+            with self._pending_lock:
+                while not self._pending:
+                    self._pending_lock.wait()
+                session_id = next(iter(self._pending))
+                args = self._pending.pop(session_id)
+            try:
+                self.index_session(*args)
+            except Exception as e:
+                print(f"Error indexing session {session_id}: {e}")
+
+    def flush(self, timeout=5.0):
+        """Wait until queued reindexing is done"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._pending_lock:
+                if not self._pending:
+                    break
+            time.sleep(0.01)
+        # The last popped session may still be writing
+        with self._lock:
+            pass
+
+    def _delete_session_rows(self, session_id):
+        if self.fts:
+            # External-content FTS rows must be deleted with their old values
+            self.db.execute(
+                "INSERT INTO clips_fts (clips_fts, rowid, custom_name, path) "
+                "SELECT 'delete', rowid, custom_name, path FROM clips WHERE session_id = ?",
+                (session_id,))
+        self.db.execute('DELETE FROM clips WHERE session_id = ?', (session_id,))
+
+    def index_session(self, data, file_path=None, file_mtime=None):
+        """(Re)index one session given its to_dict() form"""
+        session_id = data.get('session_id')
+        if not session_id:
+            return
+        clips = data.get('clips', [])
+        sources = data.get('sources', {})
+        rows = []
+        for position, clip in enumerate(clips):
+            path = clip.get('path') or sources.get(clip.get('source_id'))
+            rows.append((
+                session_id, clip.get('id'), position, clip.get('custom_name'), path,
+                clip.get('start_time'), clip.get('end_time'),
+                parse_time(clip.get('start_time')), parse_time(clip.get('end_time')),
+                clip.get('created_at')
+            ))
+
+        with self._lock, self.db:
+            self._delete_session_rows(session_id)
+            self.db.execute(
+                'INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?)',
+                (session_id, file_path, file_mtime, data.get('created_at'),
+                 data.get('last_modified'), len(clips)))
+            self.db.executemany(
+                'INSERT INTO clips (session_id, clip_id, position, custom_name, path, start_time, '
+                'end_time, start_seconds, end_seconds, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                rows)
+            if self.fts:
+                self.db.execute(
+                    'INSERT INTO clips_fts (rowid, custom_name, path) '
+                    'SELECT rowid, custom_name, path FROM clips WHERE session_id = ?',
+                    (session_id,))
+
+    def index_file(self, file_path):
+        """Index an auto-save file if it changed since it was last indexed"""
+        mtime = os.path.getmtime(file_path)
+        with self._lock:
+            row = self.db.execute(
+                'SELECT file_mtime FROM sessions WHERE file_path = ?', (file_path,)).fetchone()
+        if row and row[0] == mtime:
+            return False
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.index_session(data, file_path, mtime)
+        return True
+
+    def remove_file(self, file_path):
+        with self._lock, self.db:
+            for (session_id,) in self.db.execute(
+                    'SELECT session_id FROM sessions WHERE file_path = ?', (file_path,)).fetchall():
+                self._delete_session_rows(session_id)
+            self.db.execute('DELETE FROM sessions WHERE file_path = ?', (file_path,))
+
+    def search(self, query='', session_id=None, source=None, created_from=None, created_to=None,
+               start=None, end=None, limit=50, offset=0):
+        """Clips matching all words of `query`, narrowed by the filters"""
+        conditions = []
+        params = []
+        terms = search_terms(query or '')
+        fts_terms = [term for term in terms if self.fts_term(term)]
+        if fts_terms:
+            conditions.append('c.rowid IN (SELECT rowid FROM clips_fts WHERE clips_fts MATCH ?)')
+            suffix = '' if self.tokenizer == 'trigram' else '*'
+            params.append(' '.join(f'"{term}"{suffix}' for term in fts_terms))
+        for term in terms:
+            if term not in fts_terms:
+                conditions.append("(c.custom_name LIKE ? ESCAPE '\\' OR c.path LIKE ? ESCAPE '\\')")
+                pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                params.extend([pattern, pattern])
+        if session_id:
+            conditions.append('c.session_id = ?')
+            params.append(session_id)
+        if source:
+            conditions.append('c.path LIKE ?')
+            params.append(f'%{source}%')
+        if created_from:
+            conditions.append('c.created_at >= ?')
+            params.append(created_from)
+        if created_to:
+            conditions.append('c.created_at < ?')
+            params.append(end_bound(created_to))
+        # Clips overlapping the [start, end) time range within their source
+        if start is not None:
+            conditions.append('c.end_seconds > ?')
+            params.append(start)
+        if end is not None:
+            conditions.append('c.start_seconds < ?')
+            params.append(end)
+
+        where = ' AND '.join(conditions) or '1'
+        sql = (
+            'SELECT c.session_id, c.clip_id, c.position, c.custom_name, c.path, c.start_time, '
+            'c.end_time, c.created_at, s.file_path '
+            f'FROM clips c LEFT JOIN sessions s ON s.session_id = c.session_id WHERE {where} '
+            'ORDER BY c.created_at DESC LIMIT ? OFFSET ?'
+        )
+        started = time.perf_counter()
+        with self._lock:
+            rows = self.db.execute(sql, params + [limit, offset]).fetchall()
+        elapsed = time.perf_counter() - started
+
+        results = []
+        for row in rows:
+            results.append({
+                'session_id': row[0],
+                'clip_id': row[1],
+                'index': row[2],
+                'custom_name': row[3],
+                'path': row[4],
+                'start_time': row[5],
+                'end_time': row[6],
+                'created_at': row[7],
+                'auto_save': os.path.basename(row[8]) if row[8] else None
+            })
+        return results, elapsed
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import atomic_write_json
+
+
+def probe_media(file_path, timeout=15):
+    """Read duration and stream info with ffprobe; None if ffprobe is unavailable or fails"""
+    ffprobe = shutil.which('ffprobe')
+    if ffprobe is None:
+        return None
+    try:
+        result = subprocess.run(
+            [ffprobe, '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', file_path],
+            capture_output=True, timeout=timeout, check=True)
+        info = json.loads(result.stdout)
+    except (OSError, subprocess.SubprocessError, ValueError) as e:
+        print(f"Error probing {file_path}: {e}")
+        return None
+
+    streams = []
+    for stream in info.get('streams', []):
+        streams.append({
+            'type': stream.get('codec_type'),
+            'codec': stream.get('codec_name'),
+            'width': stream.get('width'),
+            'height': stream.get('height'),
+            'frame_rate': stream.get('avg_frame_rate'),
+            'channels': stream.get('channels')
+        })
+    duration = info.get('format', {}).get('duration')
+    return {
+        'duration': float(duration) if duration else None,
+        'format': info.get('format', {}).get('format_name'),
+        'streams': streams
+    }
+
+
+class SourceRegistry:
+    """Every distinct source file is stored once, with an id and cached metadata.
+
+    Clips refer to sources by id. Probed metadata is persisted to `cache_file`
+    and re-probed only when the file's size or mtime changes.
+    """
+
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self.sources = {}
+        self._lock = threading.Lock()
+        self._probe_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='source-probe')
+        self._pending = set()
+        self._checked = set()  # sources validated against the disk since startup
+        self.load()
+
+    @staticmethod
+    def source_id(path):
+        """Stable id derived from the path"""
+        return hashlib.sha1(os.path.normcase(path).encode('utf-8')).hexdigest()[:12]
+
+    def register(self, path):
+        """Return the source record for a path, creating it and probing in the background if needed"""
+        if not path:
+            return None
+        source_id = self.source_id(path)
+        with self._lock:
+            record = self.sources.get(source_id)
+            if record is None:
+                record = {
+                    'id': source_id,
+                    'path': sys.intern(path),
+                    'size': None,
+                    'mtime': None,
+                    'metadata': None,
+                    'probed_at': None
+                }
+                self.sources[source_id] = record
+            first_use = source_id not in self._checked
+            self._checked.add(source_id)
+        if first_use:
+            self.refresh_async(source_id)
+        return record
+
+    def get(self, source_id):
+        with self._lock:
+            return self.sources.get(source_id)
+
+    def path_of(self, source_id):
+        record = self.get(source_id)
+        return record['path'] if record else None
+
+    def is_current(self, record):
+        """True if the cached metadata still matches the file on disk"""
+        try:
+            stat = os.stat(record['path'])
+        except OSError:
+            return record['probed_at'] is not None and record['size'] is None
+        return record['probed_at'] is not None and \
+            record['size'] == stat.st_size and record['mtime'] == stat.st_mtime
+
+    def refresh(self, source_id):
+        """Probe a source now if its cached metadata is missing or stale"""
+        record = self.get(source_id)
+        if record is None or self.is_current(record):
+            return record
+
+        try:
+            stat = os.stat(record['path'])
+            size, mtime = stat.st_size, stat.st_mtime
+            metadata = probe_media(record['path'])
+        except OSError:
+            size, mtime, metadata = None, None, None
+
+        with self._lock:
+            record.update({
+                'size': size,
+                'mtime': mtime,
+                'metadata': metadata,
+                'probed_at': time.time()
+            })
+        self.save()
+        return record
+
+    def refresh_async(self, source_id):
+        """Queue a refresh unless the cache is current or one is already queued"""
+        record = self.get(source_id)
+        if record is None or self.is_current(record):
+            return
+        with self._lock:
+            if source_id in self._pending:
+                return
+            self._pending.add(source_id)
+
+        def run():
+            try:
+                self.refresh(source_id)
+            finally:
+                with self._lock:
+                    self._pending.discard(source_id)
+
+        self._probe_pool.submit(run)
+
+    def duration(self, source_id):
+        """Cached duration in seconds, without probing"""
+        record = self.get(source_id)
+        if record and record['metadata']:
+            return record['metadata'].get('duration')
+        return None
+
+    def describe(self, source_id):
+        record = self.get(source_id)
+        if record is None:
+            return None
+        return dict(record, current=self.is_current(record))
+
+    def list(self):
+        with self._lock:
+            source_ids = list(self.sources)
+        return [self.describe(source_id) for source_id in source_ids]
+
+    def load(self):
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading source cache: {e}")
+            return
+        for record in data.get('sources', []):
+            record['path'] = sys.intern(record['path'])
+            self.sources[record['id']] = record
+
+    def save(self):
+        """Write the cache"""
+        with self._lock:
+            data = {'sources': [dict(record) for record in self.sources.values()]}
+        try:
+            atomic_write_json(self.cache_file, data)
+        except OSError as e:
+            print(f"Error saving source cache: {e}")
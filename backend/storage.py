@@ -0,0 +1,17 @@
+import json
+import os
+import threading
+
+
+def atomic_write_json(path, data):
+    """Write `data` as JSON to a temporary file first, so a crash never leaves `path` half written.
+
+    Raises OSError; the temporary file is per thread, so concurrent writers never share one.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_file = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_file, path)
@@ -0,0 +1,102 @@
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+class StubMpcHandler(BaseHTTPRequestHandler):
+    """Serves info.html and variables.html from the server's `state` dict"""
+
+    def do_GET(self):
+        state = self.server.state
+        if state['delay']:
+            time.sleep(state['delay'])
+        if self.path.startswith('/variables.html'):
+            body = (
+                f'<html><p id="filepath">{state["file_path"]}</p>'
+                f'<p id="file">{state["file_path"].rsplit(chr(92), 1)[-1]}</p>'
+                f'<p id="state">{state["state"]}</p>'
+                f'<p id="position">{state["position_ms"]}</p>'
+                f'<p id="duration">{state["duration_ms"]}</p>'
+                f'<p id="playbackrate">{state["playback_rate"]}</p></html>'
+            ).encode('utf-8')
+        elif self.path.startswith('/info.html'):
+            name = state['file_path'].rsplit('\\', 1)[-1]
+            body = f'<p id="mpchc_np">« MPC-HC • {name} • 00:00:10/00:10:00 • 1 MB »</p>'.encode('utf-8')
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass  # the client gave up on a delayed response
+
+    def log_message(self, *args):
+        pass
+
+
+class StubMpcServer:
+    """A local HTTP server standing in for one MPC-HC web interface"""
+
+    def __init__(self, file_path):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubMpcHandler)
+        self.server.daemon_threads = True
+        self.server.state = {
+            'file_path': file_path,
+            'state': 2,
+            'position_ms': 10000,
+            'duration_ms': 600000,
+            'playback_rate': 1.0,
+            'delay': 0.0
+        }
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def state(self):
+        return self.server.state
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_players():
+    players = [StubMpcServer('C:\\videos\\first.mp4'), StubMpcServer('C:\\videos\\second.mp4')]
+    yield players
+    for player in players:
+        player.close()
+
+
+@pytest.fixture(scope='session')
+def backend(tmp_path_factory):
+    """The app module, run in a scratch directory so auto-saves and caches stay out of the tree"""
+    work_dir = tmp_path_factory.mktemp('backend')
+    previous = os.getcwd()
+    os.chdir(work_dir)
+    import app
+    yield app
+    if app.player_registry is not None:
+        app.player_registry.close()
+    os.chdir(previous)
+
+
+@pytest.fixture
+def client(backend):
+    return backend.app.test_client()
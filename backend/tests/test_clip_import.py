@@ -0,0 +1,83 @@
+import io
+import json
+
+import pytest
+
+import clip_import
+from clip_import import ClipImportError, read_clips, timecode_to_seconds
+
+
+def read(text, file_format, **kwargs):
+    return read_clips(io.BytesIO(text.encode('utf-8')), file_format, **kwargs)
+
+
+def test_stream_reader_joins_values_split_across_chunks(monkeypatch):
+    # Every string, number, escape and literal straddles a chunk boundary somewhere
+    monkeypatch.setattr(clip_import, 'CHUNK_SIZE', 7)
+    document = {
+        'version': 1,
+        'clips': [
+            {'start_time': 12.25 + number, 'end_time': '00:01:40.5', 'source_id': 'src',
+             'custom_name': f'片段 \\u00e9 "{number}"', 'flag': None if number % 2 else True}
+            for number in range(20)
+        ],
+        'sources': {'src': 'C:\\videos\\first.mp4'}
+    }
+    clips, skipped, errors = read(json.dumps(document), 'json')
+    assert (skipped, errors) == (0, [])
+    assert [clip['custom_name'] for clip in clips] == [f'片段 \\u00e9 "{number}"' for number in range(20)]
+    assert clips[3]['start_time'] == '00:00:15.250'
+    assert clips[0]['end_time'] == '00:01:40.500'
+    # The sources table comes after the clips
+    assert {clip['path'] for clip in clips} == {'C:\\videos\\first.mp4'}
+
+
+def test_stream_reader_stops_at_syntax_errors(monkeypatch):
+    monkeypatch.setattr(clip_import, 'CHUNK_SIZE', 8)
+    with pytest.raises(ClipImportError):
+        read('[{"start": 1, "end": 2}, {"start": 1 "end": 2}' + ' ' * 1000 + ']', 'json')
+    with pytest.raises(ClipImportError):
+        read('[{"start": 1, "end": 2}', 'json')
+
+
+@pytest.mark.parametrize('timecode, fps, seconds', [
+    ('01:00:00;00', 29.97, 3599.9964),
+    ('00:01:00;02', 29.97, 60.06),
+    ('00:10:00;00', 29.97, 599.9994),
+    ('00:01:00;04', 59.94, 60.06),
+    ('00:00:01:00', 25, 1.0),
+    ('01:00:00:00', 29.97, 3603.6036),
+])
+def test_timecode_to_seconds(timecode, fps, seconds):
+    assert timecode_to_seconds(timecode, fps) == pytest.approx(seconds, abs=1e-4)
+
+
+def test_drop_frame_needs_a_drop_frame_rate():
+    with pytest.raises(ClipImportError):
+        timecode_to_seconds('00:01:00;02', 25)
+
+
+def test_bad_csv_rows_are_skipped():
+    clips, skipped, errors = read(
+        'start,end,name,path\n'
+        '0,inf,infinite,a.mp4\n'
+        '5,2,backwards,a.mp4\n'
+        'soon,later,words,a.mp4\n'
+        '1,nan,not a number,a.mp4\n'
+        '00:00:01.5,3,kept,a.mp4\n', 'csv')
+    assert [clip['custom_name'] for clip in clips] == ['kept']
+    assert clips[0]['start_time'] == '00:00:01.500'
+    assert skipped == 4
+    assert [error.split(':')[0] for error in errors] == ['#1', '#2', '#3', '#4']
+
+
+def test_bad_jsonl_lines_are_skipped():
+    clips, skipped, errors = read(
+        '{"start": 0, "end": 1e400}\n'
+        '{"start": 0, "end": 1e306}\n'
+        'not json\n'
+        '[1, 2]\n'
+        '{"start": 1, "end": 2, "name": "kept"}\n', 'jsonl', default_path='b.mp4')
+    assert [(clip['custom_name'], clip['path']) for clip in clips] == [('kept', 'b.mp4')]
+    assert skipped == 4
+    assert len(errors) == 4
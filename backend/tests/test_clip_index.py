@@ -0,0 +1,56 @@
+import bisect
+import random
+
+import clip_index
+from clip_index import SourceIntervals
+
+
+def test_overlaps_match_a_linear_scan(monkeypatch):
+    # Small chunks so splits, merges and removed chunks all happen
+    monkeypatch.setattr(clip_index, 'CHUNK_SIZE', 4)
+    rng = random.Random(7)
+    intervals = SourceIntervals()
+    expected = {}
+    for clip_id in range(400):
+        if expected and rng.random() < 0.3:
+            removed = rng.choice(list(expected))
+            assert intervals.remove(expected.pop(removed)[0], removed)
+        else:
+            start = rng.randint(0, 200)
+            end = start + rng.choice((0, rng.random() * 5, rng.random() * 150))
+            intervals.add(start, end, clip_id)
+            expected[clip_id] = (start, end)
+
+        query_start = rng.random() * 220
+        query_end = query_start + rng.random() * 10
+        found = sorted(entry[2] for entry in intervals.overlapping(query_start, query_end))
+        assert found == sorted(key for key, (start, end) in expected.items()
+                               if start < query_end and end > query_start)
+    assert len(intervals) == len(expected)
+
+
+def test_removed_long_clip_leaves_the_scan(monkeypatch):
+    monkeypatch.setattr(clip_index, 'CHUNK_SIZE', 4)
+    intervals = SourceIntervals()
+    intervals.add(0, 10000, 'long')
+    intervals.extend([(second, second + 1, f'clip-{second}') for second in range(1, 1000)])
+    high = bisect.bisect_left(intervals.firsts, 501)
+    assert 0 in intervals._chunks_ending_after(500.5, high)
+    intervals.remove(0, 'long')
+    # Only the chunk holding 500..501 is left to scan
+    high = bisect.bisect_left(intervals.firsts, 501)
+    assert len(intervals._chunks_ending_after(500.5, high)) == 1
+    assert [entry[2] for entry in intervals.overlapping(500.5, 501)] == ['clip-500']
+
+
+def test_split_stores_a_normalized_time(client):
+    session_id = client.post('/api/session/new').get_json()['session_id']
+    client.post(f'/api/clips/{session_id}', json={
+        'start_time': '00:00:10', 'end_time': '00:00:40', 'custom_name': 'whole'
+    })
+    response = client.post(f'/api/clips/{session_id}/0/split', json={'at': '25'})
+    first, second = response.get_json()['data']
+    assert first['end_time'] == second['start_time'] == '00:00:25.000'
+
+    clips = client.get(f'/api/session/{session_id}').get_json()['data']['clips']
+    assert [clip['custom_name'] for clip in clips] == ['whole', 'whole_2']
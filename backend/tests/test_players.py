@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from mpc_client import MpcClient, MpcUnavailableError
+from player_state import PlayerStateService
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+
+def register(client, player_id, stub):
+    response = client.post('/api/players', json={'id': player_id, 'url': stub.url})
+    assert response.get_json()['success']
+
+
+def test_players_are_polled(client, stub_players):
+    first, second = stub_players
+    second.state['position_ms'] = 42000
+    register(client, 'first', first)
+    register(client, 'second', second)
+    try:
+        players = {player['id']: player for player in client.get('/api/players').get_json()['data']}
+        assert players['first']['reachable']
+        assert players['first']['file_path'] == 'C:\\videos\\first.mp4'
+        assert players['second']['position_ms'] == 42000
+        assert players['second']['state'] == 2
+    finally:
+        client.delete('/api/players/first')
+        client.delete('/api/players/second')
+
+
+def test_session_binding(client, stub_players):
+    first, second = stub_players
+    register(client, 'first', first)
+    register(client, 'second', second)
+    try:
+        session_id = client.post('/api/session/new').get_json()['session_id']
+        response = client.put(f'/api/session/{session_id}/player', json={'player_id': 'second'})
+        assert response.get_json()['data']['player_id'] == 'second'
+
+        filepath = client.get(f'/api/mpc/filepath?session_id={session_id}').get_json()
+        assert filepath['data']['file_path'] == 'C:\\videos\\second.mp4'
+
+        clip = client.post(f'/api/clips/{session_id}', json={
+            'start_time': '00:00:01', 'end_time': '00:00:02', 'custom_name': 'bound'
+        }).get_json()['data']
+        assert clip['path'] == 'C:\\videos\\second.mp4'
+
+        # Unregistering the player moves the session back to the default one
+        client.delete('/api/players/second')
+        assert client.get(f'/api/session/{session_id}').get_json()['data']['player_id'] == 'default'
+    finally:
+        client.delete('/api/players/first')
+        client.delete('/api/players/second')
+
+
+def test_player_id_from_url_can_be_deleted(client, stub_players):
+    stub = stub_players[0]
+    response = client.post('/api/players', json={'url': stub.url + '/mpc/'})
+    player_id = response.get_json()['data']['id']
+    assert player_id == f"127-0-0-1-{stub.url.rsplit(':', 1)[1]}"
+    assert client.delete(f'/api/players/{player_id}').status_code == 200
+
+
+def test_unknown_player_binding_is_rejected(client):
+    session_id = client.post('/api/session/new').get_json()['session_id']
+    response = client.put(f'/api/session/{session_id}/player', json={'player_id': 'missing'})
+    assert response.status_code == 404
+
+
+def test_circuit_opens_and_closes(stub_players):
+    stub = stub_players[0]
+    client = MpcClient(stub.url, deadline=0.5, failure_threshold=2, probe_interval=0.05)
+    service = PlayerStateService(client, freshness=0)
+    try:
+        assert service.file_path() == 'C:\\videos\\first.mp4'
+
+        stub.state['delay'] = 1.0
+        for _ in range(2):
+            with pytest.raises(MpcUnavailableError):
+                service.variables()
+        # Failures are recorded on the client's event loop
+        wait_for(lambda: client.circuit_open)
+        assert client.circuit_open
+
+        # While open, calls fail at once and carry the last known state
+        started = time.perf_counter()
+        with pytest.raises(MpcUnavailableError) as error:
+            service.variables()
+        assert time.perf_counter() - started < 0.1
+        assert error.value.last_known['file_path'] == 'C:\\videos\\first.mp4'
+
+        # The background probe closes the circuit once the player answers again
+        stub.state['delay'] = 0.0
+        wait_for(lambda: not client.circuit_open)
+        assert not client.circuit_open
+        assert service.file_path() == 'C:\\videos\\first.mp4'
+    finally:
+        client.close()
@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+from player_state import MAX_MARK_AGE, PlayerStateService, format_position
+
+
+class FakeClient:
+    """Returns a fixed variables.html result with the given request window"""
+
+    def __init__(self, requested_at, fetched_at, state=2, position_ms=10000,
+                 duration_ms=600000, playback_rate=1.0):
+        self.last_known = {}
+        self.result = {
+            'file_path': 'C:\\videos\\first.mp4',
+            'file_name': 'first.mp4',
+            'state': state,
+            'position_ms': position_ms,
+            'duration_ms': duration_ms,
+            'playback_rate': playback_rate,
+            'requested_at': requested_at,
+            'fetched_at': fetched_at
+        }
+
+    def get(self, page, parse):
+        return dict(self.result)
+
+
+def service_for(**kwargs):
+    return PlayerStateService(FakeClient(**kwargs), freshness=0)
+
+
+def test_compensates_from_request_midpoint_while_playing():
+    now = time.time()
+    # Sampled at the midpoint, now - 0.2; the mark came 150 ms later at double speed
+    service = service_for(requested_at=now - 0.3, fetched_at=now - 0.1, playback_rate=2.0)
+    mark = service.position_at(now - 0.05)
+    assert mark['mark_time_used']
+    assert mark['compensation_ms'] == pytest.approx(300, abs=1)
+    assert mark['position_ms'] == pytest.approx(10300, abs=1)
+    assert mark['error_ms'] == pytest.approx(200, abs=1)
+    assert mark['rtt_ms'] == pytest.approx(200, abs=1)
+
+
+def test_mark_before_sample_moves_position_back():
+    now = time.time()
+    service = service_for(requested_at=now - 0.1, fetched_at=now)
+    mark = service.position_at(now - 0.15)
+    assert mark['position_ms'] == pytest.approx(9900, abs=1)
+    assert format_position(mark['position_ms'], precise=True) == '00:00:09.900'
+
+
+def test_paused_player_is_not_compensated():
+    now = time.time()
+    service = service_for(requested_at=now - 0.3, fetched_at=now - 0.1, state=1)
+    mark = service.position_at(now)
+    assert mark['compensation_ms'] == 0
+    assert mark['error_ms'] == 0
+    assert mark['position_ms'] == 10000
+
+
+def test_implausible_mark_time_falls_back_to_sample_time():
+    now = time.time()
+    service = service_for(requested_at=now - 0.3, fetched_at=now - 0.1)
+    mark = service.position_at(now - MAX_MARK_AGE - 5)
+    assert not mark['mark_time_used']
+    assert mark['position_ms'] == 10000
+
+
+def test_position_is_clamped_to_duration():
+    now = time.time()
+    service = service_for(requested_at=now - 0.3, fetched_at=now - 0.1,
+                          position_ms=599950, duration_ms=600000)
+    assert service.position_at(now)['position_ms'] == 600000
+
+
+def test_timestamp_route_uses_stub_player(client, stub_players):
+    stub = stub_players[0]
+    stub.state['position_ms'] = 83000
+    client.post('/api/players', json={'id': 'timed', 'url': stub.url})
+    try:
+        data = client.get('/api/mpc/timestamp?player_id=timed').get_json()['data']
+        assert data['file_name'] == 'first.mp4'
+        # The mark (request arrival) precedes the sample, by at most half the round trip
+        compensation = data['compensation']
+        assert compensation['playing']
+        assert data['position_ms'] == compensation['reported_position_ms'] + round(compensation['applied_ms'])
+        assert abs(compensation['applied_ms']) <= compensation['rtt_ms'] / 2 + 50
+        assert data['precise_position'] == format_position(data['position_ms'], precise=True)
+    finally:
+        client.delete('/api/players/timed')
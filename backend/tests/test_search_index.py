@@ -0,0 +1,50 @@
+import sqlite3
+
+import search_index
+from search_index import FTS_SCHEMA, SCHEMA, SearchIndex
+
+
+def clip_ids(index, query):
+    return [result['clip_id'] for result in index.search(query)[0]]
+
+
+def index_with_clips(db_path):
+    index = SearchIndex(str(db_path))
+    index.index_session({'session_id': 'session', 'clips': [
+        {'id': 'cjk', 'custom_name': '第一個片段', 'path': 'C:\\videos\\one.mp4', 'created_at': '2026-01-01'},
+        {'id': 'latin', 'custom_name': 'Opening Scene', 'path': 'D:\\movie.mkv', 'created_at': '2026-01-02'}
+    ]})
+    return index
+
+
+def test_finds_words_inside_cjk_names(tmp_path):
+    index = index_with_clips(tmp_path / 'search.db')
+    assert clip_ids(index, '片段') == ['cjk']
+    assert clip_ids(index, '個片段') == ['cjk']
+    assert clip_ids(index, 'open') == ['latin']
+    assert clip_ids(index, 'scene mov') == ['latin']
+    assert clip_ids(index, 'one 片段') == ['cjk']
+
+
+def test_cjk_terms_fall_back_to_like_with_unicode61(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_index, 'FTS_TOKENIZERS', search_index.FTS_TOKENIZERS[1:])
+    index = index_with_clips(tmp_path / 'search.db')
+    assert index.tokenizer == 'unicode61'
+    assert clip_ids(index, '片段') == ['cjk']
+    assert clip_ids(index, 'open') == ['latin']
+
+
+def test_table_with_another_tokenizer_is_rebuilt(tmp_path):
+    db_path = str(tmp_path / 'search.db')
+    db = sqlite3.connect(db_path)
+    db.executescript(SCHEMA)
+    db.execute(FTS_SCHEMA.format(options=search_index.FTS_TOKENIZERS[-1][1]))
+    db.execute("INSERT INTO clips (session_id, clip_id, custom_name, created_at) "
+               "VALUES ('old', 'kept', '第一個片段', '2026-01-01')")
+    db.execute('INSERT INTO clips_fts (rowid, custom_name, path) SELECT rowid, custom_name, path FROM clips')
+    db.commit()
+    db.close()
+
+    index = SearchIndex(db_path)
+    assert index.tokenizer == search_index.FTS_TOKENIZERS[0][0]
+    assert clip_ids(index, '片段') == ['kept']
@@ -0,0 +1,189 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class ThumbnailError(Exception):
+    """A frame could not be extracted"""
+
+
+class ThumbnailCache:
+    """Size-bounded LRU cache of image files on disk.
+
+    Recency is kept in memory and mirrored to file mtimes, so the order
+    survives restarts.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> size, least recently used first
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file() or not entry.name.endswith('.jpg'):
+                continue
+            if '.tmp.' in entry.name:
+                # Left over from an interrupted extraction
+                os.remove(entry.path)
+                continue
+            stat = entry.stat()
+            files.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(files):
+            self.entries[key] = size
+            self.total_bytes += size
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}.jpg")
+
+    def get(self, key):
+        """Path of a cached image, marking it recently used; None on a miss"""
+        with self._lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.total_bytes -= self.entries.pop(key, 0)
+            return None
+        return path
+
+    def put(self, key, temp_path):
+        """Move a finished image into the cache and evict the least recently used"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path_for(key)
+        os.replace(temp_path, path)
+        size = os.path.getsize(path)
+
+        evicted = []
+        with self._lock:
+            self.total_bytes += size - self.entries.pop(key, 0)
+            self.entries[key] = size
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                old_key, old_size = self.entries.popitem(last=False)
+                self.total_bytes -= old_size
+                evicted.append(old_key)
+
+        for old_key in evicted:
+            try:
+                os.remove(self.path_for(old_key))
+            except OSError:
+                pass
+        return path
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes
+            }
+
+
+class ThumbnailService:
+    """Extracts boundary frames and preview strips with ffmpeg on background workers.
+
+    Interactive requests and prefetching use separate pools so a long prefetch
+    never delays the thumbnail someone is looking at. Identical requests in
+    flight share one job.
+    """
+
+    def __init__(self, cache, workers=2, prefetch_workers=1):
+        self.cache = cache
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnail')
+        self._prefetch_pool = ThreadPoolExecutor(max_workers=prefetch_workers,
+                                                 thread_name_prefix='thumbnail-prefetch')
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available():
+        return shutil.which('ffmpeg') is not None
+
+    @staticmethod
+    def cache_key(source_path, source_mtime, kind, start, end, width, frames):
+        """Key by source (and its version), timestamp(s) and size"""
+        raw = f"{source_path}|{source_mtime}|{kind}|{int(start * 1000)}|{int(end * 1000)}|{width}|{frames}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def request(self, source_path, kind, start, end=None, width=320, frames=8, prefetch=False):
+        """Cached image path, or a Future resolving to it once extracted"""
+        try:
+            source_mtime = os.path.getmtime(source_path)
+        except OSError:
+            raise ThumbnailError('來源檔案不存在')
+        end = start if end is None else end
+        key = self.cache_key(source_path, source_mtime, kind, start, end, width, frames)
+
+        path = self.cache.get(key)
+        if path:
+            return path
+
+        args = (key, source_path, kind, start, end, width, frames)
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is not None:
+                if not prefetch and job['prefetch'] and not job['running']:
+                    # Still queued behind prefetches: also queue it on the interactive
+                    # pool, and whichever worker gets to it first does the work
+                    job['prefetch'] = False
+                    self._pool.submit(self._run, job, args)
+                return job['future']
+            job = {'future': Future(), 'prefetch': prefetch, 'running': False}
+            self._inflight[key] = job
+
+        (self._prefetch_pool if prefetch else self._pool).submit(self._run, job, args)
+        return job['future']
+
+    def _run(self, job, args):
+        key = args[0]
+        with self._lock:
+            if job['running']:
+                return
+            job['running'] = True
+        try:
+            job['future'].set_result(self._extract(*args))
+        except BaseException as e:
+            job['future'].set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _extract(self, key, source_path, kind, start, end, width, frames):
+        if not self.available():
+            raise ThumbnailError('找不到 ffmpeg')
+
+        os.makedirs(self.cache.cache_dir, exist_ok=True)
+        temp_path = os.path.join(self.cache.cache_dir, f"{key}.{threading.get_ident()}.tmp.jpg")
+        if kind == 'strip':
+            duration = max(end - start, 0.1)
+            video_filter = f"fps={frames}/{duration:.3f},scale={width}:-2,tile={frames}x1"
+            command = ['ffmpeg', '-v', 'error', '-y', '-ss', f"{start:.3f}", '-t', f"{duration:.3f}",
+                       '-i', source_path, '-vf', video_filter, '-frames:v', '1', '-q:v', '5', temp_path]
+        else:
+            # -ss before -i seeks by keyframe index instead of decoding from the start
+            command = ['ffmpeg', '-v', 'error', '-y', '-ss', f"{start:.3f}", '-i', source_path,
+                       '-frames:v', '1', '-vf', f"scale={width}:-2", '-q:v', '5', temp_path]
+
+        try:
+            subprocess.run(command, capture_output=True, timeout=60, check=True)
+        except subprocess.CalledProcessError as e:
+            raise ThumbnailError(f"ffmpeg 失敗: {e.stderr.decode('utf-8', 'replace').strip()}")
+        except (OSError, subprocess.SubprocessError) as e:
+            raise ThumbnailError(f"ffmpeg 失敗: {e}")
+        if not os.path.exists(temp_path):
+            raise ThumbnailError('無法擷取影格')
+        return self.cache.put(key, temp_path)
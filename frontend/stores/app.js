@@ -90,11 +90,16 @@ export const useAppStore = defineStore('app', () => {
   }
 
   async function fetchCurrentTimestamp() {
+    // Record the keypress time so the backend can compensate for request latency
+    const clientTime = Date.now()
     try {
-      const response = await $fetch(`${apiBase}/api/mpc/timestamp`)
+      const response = await $fetch(`${apiBase}/api/mpc/timestamp`, {
+        query: { client_time: clientTime }
+      })
       
       if (response.success) {
-        currentTimestamp.value = response.data.current_position
+        // The precise form keeps the sub-second latency compensation
+        currentTimestamp.value = response.data.precise_position
         showMessage('已獲取當前時間戳記')
         return response.data
       } else {
@@ -110,7 +115,7 @@ export const useAppStore = defineStore('app', () => {
   async function fetchStartTime() {
     try {
       const data = await fetchCurrentTimestamp()
-      startTime.value = data.current_position
+      startTime.value = data.precise_position
       showMessage('開始時間已設定')
     } catch (error) {
       // Error already handled in fetchCurrentTimestamp
@@ -120,7 +125,7 @@ export const useAppStore = defineStore('app', () => {
   async function fetchEndTime() {
     try {
       const data = await fetchCurrentTimestamp()
-      endTime.value = data.current_position
+      endTime.value = data.precise_position
       showMessage('結束時間已設定')
       
       // Validate times
@@ -153,10 +158,13 @@ export const useAppStore = defineStore('app', () => {
   }
 
   function secondsToTime(seconds) {
-    const hours = Math.floor(seconds / 3600)
-    const minutes = Math.floor((seconds % 3600) / 60)
-    const secs = seconds % 60
-    return `${hours.toString().padStart(2, '0')}:${minutes.toString().padStart(2, '0')}:${secs.toString().padStart(2, '0')}`
+    const totalMillis = Math.round(seconds * 1000)
+    const hours = Math.floor(totalMillis / 3600000)
+    const minutes = Math.floor((totalMillis % 3600000) / 60000)
+    const secs = Math.floor((totalMillis % 60000) / 1000)
+    const millis = totalMillis % 1000
+    const time = `${hours.toString().padStart(2, '0')}:${minutes.toString().padStart(2, '0')}:${secs.toString().padStart(2, '0')}`
+    return millis ? `${time}.${millis.toString().padStart(3, '0')}` : time
   }
 
   async function addClip(customName = null) {
@@ -196,7 +204,7 @@ export const useAppStore = defineStore('app', () => {
         endTime.value = ''
         clipName.value = ''
         
-        showMessage('片段已新增')
+        showMessage(response.overlaps?.length ? response.message : '片段已新增')
       } else {
         throw new Error(response.error)
       }
@@ -267,6 +275,20 @@ export const useAppStore = defineStore('app', () => {
     }
   }
 
+  function prefetchThumbnails(startIndex = 0, count = 20) {
+    // For views that show thumbnails, with the range they display. Fire and forget:
+    // the backend extracts previews in the background
+    if (!clips.value.length) return
+    $fetch(`${apiBase}/api/clips/${sessionId.value}/thumbnails/prefetch`, {
+      method: 'POST',
+      body: { start_index: startIndex, count }
+    }).catch((error) => console.warn('Thumbnail prefetch failed:', error))
+  }
+
+  function thumbnailUrl(index, kind = 'start') {
+    return `${apiBase}/api/clips/${sessionId.value}/${index}/thumbnail/${kind}`
+  }
+
   async function exportClips() {
     if (!hasClips.value) {
       showMessage('沒有片段可匯出')
@@ -297,6 +319,33 @@ export const useAppStore = defineStore('app', () => {
     }
   }
 
+  async function importClips(file, mode = 'append') {
+    try {
+      isLoading.value = true
+
+      const form = new FormData()
+      form.append('file', file)
+      const response = await $fetch(`${apiBase}/api/clips/${sessionId.value}/import`, {
+        method: 'POST',
+        query: { mode },
+        body: form
+      })
+
+      if (response.success) {
+        await loadSession()
+        showMessage(response.message)
+        return response.data
+      } else {
+        throw new Error(response.error)
+      }
+    } catch (error) {
+      console.error('Failed to import clips:', error)
+      showMessage('匯入失敗')
+    } finally {
+      isLoading.value = false
+    }
+  }
+
   async function startClipping() {
     if (!hasClips.value) {
       showMessage('沒有片段可剪輯')
@@ -429,7 +478,10 @@ export const useAppStore = defineStore('app', () => {
     removeClip,
     updateClip,
     loadSession,
+    prefetchThumbnails,
+    thumbnailUrl,
     exportClips,
+    importClips,
     startClipping,
     showMessage,
     toggleDarkMode,
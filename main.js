@@ -2,6 +2,7 @@ const { app, BrowserWindow, ipcMain, Menu, shell, dialog, globalShortcut } = req
 const path = require('path');
 const { spawn } = require('child_process');
 const fs = require('fs');
+const http = require('http');
 
 // Keep a global reference of the window object
 let mainWindow;
@@ -316,11 +317,48 @@ function startFlaskServer() {
     });
 }
 
+// Matches the backend's --drain-timeout, plus a margin for the final saves
+const FLASK_SHUTDOWN_TIMEOUT = 35000;
+
 function stopFlaskServer() {
-    if (flaskProcess) {
-        flaskProcess.kill();
-        flaskProcess = null;
+    // Ask the backend to drain and save instead of killing it; on Windows kill()
+    // ends the process at once and skips the backend's own shutdown path.
+    const child = flaskProcess;
+    flaskProcess = null;
+    if (!child || child.exitCode !== null) {
+        return Promise.resolve();
     }
+
+    return new Promise((resolve) => {
+        const forceKill = setTimeout(() => {
+            console.error('Flask server did not exit in time, killing it');
+            child.kill();
+        }, FLASK_SHUTDOWN_TIMEOUT);
+
+        child.once('exit', () => {
+            clearTimeout(forceKill);
+            resolve();
+        });
+
+        const request = http.request({
+            host: '127.0.0.1',
+            port: 5000,
+            path: '/api/shutdown',
+            method: 'POST',
+            timeout: 5000
+        }, (response) => {
+            response.resume();
+            if (response.statusCode !== 200) {
+                child.kill();
+            }
+        });
+        request.on('timeout', () => request.destroy(new Error('shutdown request timed out')));
+        request.on('error', (error) => {
+            console.error(`Flask shutdown request failed: ${error.message}`);
+            child.kill();
+        });
+        request.end();
+    });
 }
 
 function registerGlobalShortcuts() {
@@ -453,15 +491,17 @@ app.whenReady().then(() => {
 
 app.on('window-all-closed', () => {
     if (process.platform !== 'darwin') {
-        unregisterGlobalShortcuts();
-        stopFlaskServer();
         app.quit();
     }
 });
 
-app.on('before-quit', () => {
+app.on('before-quit', (event) => {
     unregisterGlobalShortcuts();
-    stopFlaskServer();
+    if (flaskProcess) {
+        // Hold the quit until the backend has flushed its auto-saves
+        event.preventDefault();
+        stopFlaskServer().finally(() => app.quit());
+    }
 });
 
 // Security: Prevent new window creation